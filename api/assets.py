@@ -6,6 +6,7 @@ from flask_restplus import abort, Namespace, Resource
 from flask_jwt_extended import jwt_required
 
 from models.asset import Asset
+from models.candle import Candle, DICT_FIELDS
 from models.constants import MAX_INT, MIN_INT
 
 API = Namespace('assets', description='assets endpoint')
@@ -25,8 +26,8 @@ class AutocompleteAsset(Resource):
             Response -- The flask Response object.
         """
         args = AUTOCOMPLETE_PARSER.parse_args()
-        assets = Asset.autocomplete_by_name(args['asset_name'])
-        assets_dict = [asset.as_dict_autocomplete() for asset in assets]
+        assets = Asset.iter_summary(Asset.autocomplete_by_name(args['asset_name']))
+        assets_dict = [Asset.summary_as_dict(asset) for asset in assets]
         return make_response(jsonify(assets_dict), 200)
 
 HISTORICAL_DAILY_PARSER = API.parser()
@@ -63,8 +64,8 @@ class HistoricalDaily(Resource):
                 end_date = parser.parse(args['end_date'])
             except Exception:
                 abort(400, "Invalid {end_date} given.")
-        candles = asset.get_candles_within(start=start_date, finish=end_date, exclude_filler=True)
-        candles_dict = [candle.as_dict() for candle in candles]
+        candles = asset.get_candles_within(start=start_date, finish=end_date, exclude_filler=True, fields=DICT_FIELDS)
+        candles_dict = [Candle.document_as_dict(candle) for candle in candles.as_pymongo()]
         return make_response(jsonify(candles_dict), 200)
 
 HISTORICAL_INTERVAL_PARSER = API.parser()
@@ -104,8 +105,8 @@ class HistoricalInterval(Resource):
                 abort(400, "Invalid {end_datetime} given.")
         if args['interval'] <= 0 or args['interval'] < MIN_INT or args['interval'] > MAX_INT:
             abort(400, "Invalid {interval} given.")
-        candles = asset.get_candles_within(start=start_date, finish=end_date, interval=args['interval'], exclude_filler=True)
-        candles_dict = [candle.as_dict() for candle in candles]
+        candles = asset.get_candles_within(start=start_date, finish=end_date, interval=args['interval'], exclude_filler=True, fields=DICT_FIELDS)
+        candles_dict = [Candle.document_as_dict(candle) for candle in candles.as_pymongo()]
         return make_response(jsonify(candles_dict), 200)
 
 @API.route('/list')
@@ -117,9 +118,7 @@ class ListAssets(Resource):
         Returns:
             Response -- The flask Response object.
         """
-        assets = Asset.get()
-        assets_dict = [asset.as_dict() for asset in assets]
-        return make_response(jsonify(assets_dict), 200)
+        return make_response(jsonify(Asset.list_as_dicts()), 200)
 
 PERFORMANCE_DAILY_PARSER = API.parser()
 PERFORMANCE_DAILY_PARSER.add_argument('asset_id', type=str, required=True, help='The ID of the asset', location='args')
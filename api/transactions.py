@@ -50,7 +50,7 @@ class CreateTransaction(Resource):
             return abort(400, "Invalid {date_purchased} specified.")
         if date_purchased > datetime.utcnow():
             return abort(400, "The {date_purchased} cannot be ahead of time.")
-        purchase_candle = asset.get_daily_candle(date_purchased)
+        purchase_candle = asset.get_daily_candle_from_datetime(date_purchased)
         if purchase_candle is None and date_purchased.date() != datetime.utcnow().date():
             return abort(400, "The given {date_purchased} is prior to the platform's pricing history for the asset.")
         if args['price_purchased'] is None:
@@ -82,13 +82,13 @@ class CreateTransaction(Resource):
                 if date_sold.date() == datetime.utcnow().date():
                     price_sold = asset.get_price()
                 else:
-                    sell_candle = asset.get_daily_candle(date_sold)
+                    sell_candle = asset.get_daily_candle_from_datetime(date_sold)
                     if sell_candle is None:
                         return abort(400, "The given {date_sold} has no data for the asset in the platform's pricing history.")
                     price_sold = sell_candle.get_close()
             else:
                 if date_sold.date() != datetime.utcnow().date():
-                    sell_candle = asset.get_daily_candle(date_sold)
+                    sell_candle = asset.get_daily_candle_from_datetime(date_sold)
                     if sell_candle is None:
                         return abort(400, "The given {date_sold} has no data for the asset in the platform's pricing history.")
                 try:
@@ -120,7 +120,7 @@ class DeleteTransaction(Resource):
         transaction = Transaction.get_by_id(args['transaction_id'])
         if transaction is None:
             return abort(400, "Invalid {transaction_id} specified.")
-        if transaction.get_user().get_email() != get_jwt_identity():
+        if transaction.get_user_email() != get_jwt_identity():
             return abort(401, "You are not authorised to delete this transaction.")
         if Transaction.remove(transaction):
             return make_response(jsonify({"msg": "The transaction was successfully deleted."}), 200)
@@ -144,7 +144,7 @@ class ReadTransaction(Resource):
         transaction = Transaction.get_by_id(args['transaction_id'])
         if transaction is None:
             return abort(400, "Invalid {transaction_id} specified.")
-        if transaction.get_user().get_email() != get_jwt_identity():
+        if transaction.get_user_email() != get_jwt_identity():
             return abort(401, "You are not authorised to read this transaction.")
         return make_response(jsonify(transaction.as_dict()), 200)
 
@@ -172,7 +172,7 @@ class UpdateTransaction(Resource):
         transaction = Transaction.get_by_id(args['transaction_id'])
         if transaction is None:
             return abort(400, "Invalid {transaction_id} specified.")
-        if transaction.get_user().get_email() != get_jwt_identity():
+        if transaction.get_user_email() != get_jwt_identity():
             return abort(401, "You are not authorised to update this transaction.")
         if args['asset_id'] is not None:
             asset = Asset.get_by_id(args['asset_id'])
@@ -195,7 +195,7 @@ class UpdateTransaction(Resource):
                 return abort(400, "Invalid {date_purchased} specified.")
             if date_purchased > datetime.utcnow():
                 return abort(400, "The {date_purchased} cannot be ahead of time.")
-            purchase_candle = transaction.get_asset().get_daily_candle(date_purchased)
+            purchase_candle = transaction.get_asset().get_daily_candle_from_datetime(date_purchased)
             if purchase_candle is None and (date_purchased.date() != datetime.utcnow().date()):
                 return abort(400, "The given {date_purchased} is prior to the platform's pricing history for the asset.")
             transaction.set_buy_date(date_purchased)
@@ -227,7 +227,7 @@ class UpdateTransaction(Resource):
                     return abort(400, "The {date_sold} cannot be ahead of time.")
                 if date_sold <= transaction.get_buy_date():
                     return abort(400, "The {date_sold} must be further ahead in time than the {date_purchased}.")
-                sell_candle = transaction.get_asset().get_daily_candle(date_sold)
+                sell_candle = transaction.get_asset().get_daily_candle_from_datetime(date_sold)
                 if sell_candle is None and date_sold.date() != datetime.utcnow().date():
                     return abort(400, "The given {date_sold} is outside the platform's pricing history for the asset.")
                 transaction.set_sell_date(date_sold)
@@ -246,12 +246,9 @@ class UpdateTransaction(Resource):
                 if date_sold.date() == datetime.utcnow().date():
                     transaction.set_sell_price(transaction.get_asset().get_price())
                 else:
-                    sell_candle = transaction.get_asset().get_daily_candle(date_sold)
+                    sell_candle = transaction.get_asset().get_daily_candle_from_datetime(date_sold)
                     if sell_candle is None:
                         return abort(400, "The given {date_sold} has no data for the asset in the platform's pricing history.")
                     transaction.set_sell_price(sell_candle.get_close())
         transaction.save()
-        user = transaction.user.fetch()
-        user.set_portfolio_historical(None)
-        user.save()
         return make_response(jsonify({"msg": "The transaction was successfully updated."}), 200)
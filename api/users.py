@@ -6,6 +6,7 @@ from flask_jwt_extended import get_jwt_identity, jwt_required
 from werkzeug.datastructures import FileStorage
 
 from models.asset import Asset
+from models.transaction import Transaction
 from models.user import User
 from local_config import PROFILE_PIC_TYPES
 
@@ -36,7 +37,7 @@ class UserPortfolioHistorical(Resource):
         Returns:
             Response -- The Flask response object.
         """
-        user = User.get_by_email(get_jwt_identity())
+        user = User.get_by_email(get_jwt_identity(), with_historical=True)
         if user is None:
             return abort(403, "You are not permitted to access this endpoint.")
         historical_portfolio = user.get_portfolio_historical()
@@ -63,7 +64,8 @@ class UserTransactions(Resource):
         if user is None:
             return abort(403, "You are not permitted to access this endpoint.")
         transactions = user.get_transactions()
-        transactions_json = [transaction.as_dict() for transaction in transactions]
+        assets = Transaction.prefetch_assets(transactions, ['name', 'ticker', 'price'])
+        transactions_json = [transaction.as_dict(assets) for transaction in transactions]
         return make_response(jsonify(transactions_json), 200)
 
 @API.route('/read_picture')
@@ -76,7 +78,7 @@ class ReadPictureUser(Resource):
         Returns:
             Response -- The Flask response object.
         """
-        user = User.get_by_email(get_jwt_identity())
+        user = User.get_by_email(get_jwt_identity(), with_picture=True)
         if user is None:
             return abort(403, "You are not permitted to access this endpoint.")
         picture = user.get_picture()
@@ -147,7 +149,7 @@ class UploadUser(Resource):
             Response -- The Flask response object.
         """
         args = UPLOAD_PARSER.parse_args()
-        user = User.get_by_email(get_jwt_identity())
+        user = User.get_by_email(get_jwt_identity(), with_picture=True)
         if args['profile_picture'].content_type not in PROFILE_PIC_TYPES:
             return abort(400, "Invalid {profile_picture} content type. Valid types: " + str(PROFILE_PIC_TYPES))
         if user is None:
@@ -3,10 +3,20 @@ from subprocess import Popen
 from api import API
 from globals import APP as FLASK_APP
 import local_config as CONFIG
+from models.asset import Asset
 
 Popen("python datalink.py")
 
 API.init_app(FLASK_APP)
 
+@FLASK_APP.teardown_request
+def clear_request_caches(exception: Exception = None) -> None:
+    """Clears the caches that are only valid for the lifetime of a single request.
+    
+    Keyword Arguments:
+        exception {Exception} -- The exception raised by the request, if any. (default: {None})
+    """
+    Asset.clear_performance_cache()
+
 if __name__ == "__main__":
     FLASK_APP.run(host='0.0.0.0', port=CONFIG.PORT, debug=False)
@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
 from time import sleep
-from typing import List
+from typing import Dict, List
 import csv
 import json
 import os
@@ -9,13 +10,14 @@ import multiprocessing.dummy as mp
 
 from alpha_vantage.foreignexchange import ForeignExchange
 from alpha_vantage.timeseries import TimeSeries
+from bson import ObjectId
 from dateutil import parser
 from dateutil.relativedelta import relativedelta
 from dateutil.tz import UTC
 from pytrends.request import TrendReq
 import dateutil.tz as tz
 
-from models.asset import Currency, Stock
+from models.asset import Asset, Currency, Stock
 from models.candle import Candle
 from models.constants import INTERVAL_DAY, INTERVAL_HOUR, INTERVAL_MINUTE, INTERVAL_MONTH, INTERVAL_WEEK
 from models.trend import Trend
@@ -60,6 +62,9 @@ class AssetClass(ABC):
         """
         for updater in self.updaters:
             if updater.requires_update():
+                # The performance lookups are memoised per request in the API; the DataLink has no
+                # requests, so they're cleared before each pass rather than serving stale Candles
+                Asset.clear_performance_cache()
                 updater.do_update()
 
     @abstractmethod
@@ -135,18 +140,22 @@ class CurrencyUpdaterDaily(IntervalUpdater):
 
     def do_update(self):
         CONFIG.DATA_LOGGER.info("CurrencyUpdaterDaily -> do_update() -> start")
+        assets = list(Currency.objects)
+        last_candles = Candle.get_last_candles(assets)
         pool = mp.Pool(CONFIG.WORKER_THREADS)
-        pool.map(self.sync_asset, Currency.objects)
+        pool.starmap(self.sync_asset, [(asset, last_candles) for asset in assets])
         pool.close()
         pool.join()
         CONFIG.DATA_LOGGER.info("CurrencyUpdaterDaily -> do_update() -> finish")
         self.last_update = datetime.utcnow()
 
-    def sync_asset(self, asset: 'Asset') -> List:
+    def sync_asset(self, asset: 'Asset', last_candles: Dict[ObjectId, 'Candle'] = None) -> List:
         """Updates the daily currency data for the specified asset.
         
         Arguments:
             asset {Asset} -- The asset to be updated.
+            last_candles {Dict[ObjectId, Candle]} -- The prefetched last daily Candles, as per
+            Candle.get_last_candles(); looked up for the asset if not given. (default: {None})
         
         Returns:
             List -- Returns a list containing whether the update was successful (bool) and
@@ -154,7 +163,10 @@ class CurrencyUpdaterDaily(IntervalUpdater):
         """
         CONFIG.DATA_LOGGER.info("CurrencyUpdaterDaily -> sync_asset(%s) -> start", asset.get_name())
         # Get the last updated candle
-        latest_candle = asset.get_last_candle()
+        if last_candles is None:
+            latest_candle = asset.get_last_candle()
+        else:
+            latest_candle = last_candles.get(asset.pk)
         # By default we won't update
         sync_type = None
         if latest_candle is not None:
@@ -263,8 +275,9 @@ class CurrencyUpdaterDaily(IntervalUpdater):
             candles.append(candle)
         if candles:
             # if we have candles to insert, then insert them all now
-            Candle.objects.insert(candles)
+            Candle.bulk_upsert(candles)
             asset.update_earliest_timestamp()
+            asset.update_last_candle()
             asset.save()
         else:
             target_day = datetime.utcnow().date()
@@ -273,7 +286,7 @@ class CurrencyUpdaterDaily(IntervalUpdater):
                 candles.append(Candle(asset=asset, close=latest_candle.get_close(), open_time=filler_candle_stamp, interval=INTERVAL_DAY))
                 filler_candle_stamp = filler_candle_stamp + timedelta(days=1)
             if candles:
-                Candle.objects.insert(candles)
+                Candle.bulk_upsert(candles)
         
         CONFIG.DATA_LOGGER.info("CurrencyUpdaterDaily -> sync_asset(%s) -> finish(sync)", asset.get_name())
         return [True, len(candles)]
@@ -396,18 +409,22 @@ class StockUpdaterDaily(IntervalUpdater):
 
     def do_update(self):
         CONFIG.DATA_LOGGER.info("StockUpdaterDaily -> do_update() -> start")
+        assets = list(Stock.objects)
+        last_candles = Candle.get_last_candles(assets)
         pool = mp.Pool(CONFIG.WORKER_THREADS)
-        pool.map(self.sync_asset, Stock.objects)
+        pool.starmap(self.sync_asset, [(asset, last_candles) for asset in assets])
         pool.close()
         pool.join()
         CONFIG.DATA_LOGGER.info("StockUpdaterDaily -> do_update() -> finish")
         self.last_update = datetime.utcnow()
 
-    def sync_asset(self, asset: 'Asset') -> List:
+    def sync_asset(self, asset: 'Asset', last_candles: Dict[ObjectId, 'Candle'] = None) -> List:
         """Updates the daily stock data for the specified asset.
         
         Arguments:
             asset {Asset} -- The Asset to be updated.
+            last_candles {Dict[ObjectId, Candle]} -- The prefetched last daily Candles, as per
+            Candle.get_last_candles(); looked up for the asset if not given. (default: {None})
         
         Returns:
             List -- Returns a list reflecting whether the update was successful (bool)
@@ -415,7 +432,10 @@ class StockUpdaterDaily(IntervalUpdater):
         """
         CONFIG.DATA_LOGGER.info("StockUpdaterDaily -> sync_asset(%s) -> start", asset.get_name())
         # Get the last updated candle
-        latest_candle = asset.get_last_candle()
+        if last_candles is None:
+            latest_candle = asset.get_last_candle()
+        else:
+            latest_candle = last_candles.get(asset.pk)
         # By default we won't update
         sync_type = None
         if latest_candle is not None:
@@ -526,8 +546,9 @@ class StockUpdaterDaily(IntervalUpdater):
             candles.append(candle)
         if candles:
             # if we have candles to insert, then insert them all now
-            Candle.objects.insert(candles)
+            Candle.bulk_upsert(candles)
             asset.update_earliest_timestamp()
+            asset.update_last_candle()
             asset.save()
         else:
             target_day = datetime.utcnow().date()
@@ -536,7 +557,7 @@ class StockUpdaterDaily(IntervalUpdater):
                 candles.append(Candle(asset=asset, close=latest_candle.get_close(), open_time=filler_candle_stamp, interval=INTERVAL_DAY))
                 filler_candle_stamp = filler_candle_stamp + timedelta(days=1)
             if candles:
-                Candle.objects.insert(candles)
+                Candle.bulk_upsert(candles)
         CONFIG.DATA_LOGGER.info("StockUpdaterDaily -> sync_asset(%s) -> finish(sync)", asset.get_name())
         return [True, len(candles)]
 
@@ -595,12 +616,16 @@ class StockUpdaterLive(IntervalUpdater):
                     os._exit(1)
         if data is None:
             return [False, 0]
+        assets = {asset.get_ticker(): asset for asset in Stock.objects(ticker__in=tickers)}
+        prices = []
+        is_successful = True
         for stock in data:
-            asset = Stock.objects(ticker=stock['1. symbol']).first()
+            asset = assets.get(stock['1. symbol'])
             if asset is None:
                 CONFIG.DATA_LOGGER.error("StockUpdaterLive -> sync_asset() -> 2")
                 CONFIG.DATA_LOGGER.error(repr(stock))
-                return [False, 0]
+                is_successful = False
+                break
             try:
                 datestamp = parser.parse(stock['4. timestamp'])
                 datestamp = datestamp.replace(tzinfo=tz.gettz("US/Eastern"))
@@ -610,21 +635,27 @@ class StockUpdaterLive(IntervalUpdater):
                 CONFIG.DATA_LOGGER.error(stock['4. timestamp'])
                 CONFIG.DATA_LOGGER.error(str(asset.as_dict()))
                 CONFIG.DATA_LOGGER.exception(str(ex))
-                return [False, 0]
+                is_successful = False
+                break
             if datestamp is None:
                 CONFIG.DATA_LOGGER.error("StockUpdaterLive -> sync_asset() -> 4")
                 CONFIG.DATA_LOGGER.error(str(asset.as_dict()))
                 CONFIG.DATA_LOGGER.error(data[0]['6. Last Refreshed'])
-                return [False, 0]
+                is_successful = False
+                break
             try:
-                asset.set_price(float(stock['2. price']))
+                price = float(stock['2. price'])
             except Exception as ex:
                 CONFIG.DATA_LOGGER.error("StockUpdaterLive -> sync_asset() -> 5")
                 CONFIG.DATA_LOGGER.error(str(asset.as_dict()))
                 CONFIG.DATA_LOGGER.exception(str(ex))
-                return [False, 0]
-            asset.set_price_timestamp(datestamp)
-            asset.save()
+                is_successful = False
+                break
+            prices.append((asset.pk, price, datestamp))
+        # The prices parsed before any failure are still written, as they were when saved one by one
+        Stock.bulk_update_prices(prices)
+        if not is_successful:
+            return [False, 0]
         CONFIG.DATA_LOGGER.info("StockUpdaterLive -> sync_asset(%s to %s) -> finish", tickers[0], tickers[-1])
         return [True, len(data)]
 
@@ -637,13 +668,13 @@ class AssetUpdaterAggregation(IntervalUpdater):
         self.provider = provider
         self.source = source
 
-    def aggregate_candles(self, asset: 'Asset', interval: int, candles: 'QuerySet[Candle]') -> 'Candle':
+    def aggregate_candles(self, asset: 'Asset', interval: int, candles: List['Candle']) -> 'Candle':
         """Combines multiple candles into a given candle of the given interval.
         
         Arguments:
             asset {Asset} -- The Asset for the resulting Candle is for.
             interval {int} -- The time interval (in seconds) of the Candle.
-            candles {QuerySet[Candle]} -- An iterable QuerySet of the Candles to be combined.
+            candles {List[Candle]} -- The Candles to be combined.
         
         Returns:
             Candle -- The resulting aggregate Candle for the given data.
@@ -689,6 +720,22 @@ class AssetUpdaterAggregation(IntervalUpdater):
         CONFIG.DATA_LOGGER.info("AssetUpdaterAggregation -> do_update() -> finish")
         self.last_update = datetime.utcnow()
 
+    def get_daily_candles(self, asset: 'Asset', start: 'date') -> List:
+        """Returns the market open daily candles of the given asset from the given date in a single
+        query, so that each aggregated period can be sliced out of them rather than queried for.
+        
+        Arguments:
+            asset {Asset} -- The Asset to return the Candles for.
+            start {date} -- The date of the first Candle (inclusive).
+        
+        Returns:
+            List -- Returns in a List the chronological open times (List[datetime]) and the
+            matching Candles (List[Candle]).
+        """
+        fields = ['open', 'close', 'high', 'low', 'volume', 'open_time']
+        candles = list(Candle.get_asset_within(asset=asset, interval=INTERVAL_DAY, start=start, exclude_filler=True, fields=fields).order_by('open_time'))
+        return [[candle.get_open_time() for candle in candles], candles]
+
     def sync_asset(self, asset: 'Asset') -> None:
         """Calculates the weekly & monthly candles for the given asset.
         
@@ -719,7 +766,7 @@ class AssetUpdaterAggregation(IntervalUpdater):
                 CONFIG.DATA_LOGGER.error(str(asset.as_dict()))
                 return [False, 0]
             if first_daily_candle.get_open_time().day != 1:
-                first_daily_candle = asset.get_daily_candle(first_daily_candle.get_open_time().replace(day=1)+relativedelta(months=1))
+                first_daily_candle = asset.get_daily_candle_from_datetime(first_daily_candle.get_open_time().replace(day=1)+relativedelta(months=1))
                 if first_daily_candle is None:
                     CONFIG.DATA_LOGGER.error("AssetUpdaterAggregation -> sync_asset_monthly() -> 2")
                     CONFIG.DATA_LOGGER.error(str(asset.as_dict()))
@@ -733,13 +780,17 @@ class AssetUpdaterAggregation(IntervalUpdater):
                 return [False, 0]
             month_start = (last_monthly_candle.get_open_time().replace(day=1)+relativedelta(months=1)).date()
         month_end = (month_start+relativedelta(months=1))-timedelta(days=1)
+        if month_end < datetime.utcnow().date():
+            open_times, daily_candles = self.get_daily_candles(asset, month_start)
         while month_end < datetime.utcnow().date():
-            month_of_candles = asset.get_candles_within(interval=INTERVAL_DAY, start=month_start, finish=month_end)
+            first = bisect_left(open_times, datetime.combine(month_start, time.min))
+            last = bisect_right(open_times, datetime.combine(month_end, time.min))
+            month_of_candles = daily_candles[first:last]
             candles.append(self.aggregate_candles(asset, INTERVAL_MONTH, month_of_candles))
             month_start = month_start + relativedelta(months=1)
             month_end = (month_start+relativedelta(months=1))-timedelta(days=1)
         if candles:
-            Candle.objects.insert(candles)
+            Candle.bulk_upsert(candles)
         CONFIG.DATA_LOGGER.info("AssetUpdaterAggregation -> sync_asset_monthly(%s) -> finish", asset.get_name())
         return [True, len(candles)]
 
@@ -766,7 +817,7 @@ class AssetUpdaterAggregation(IntervalUpdater):
                 return [False, 0]
             weekday = first_daily_candle.get_open_time().weekday()
             if weekday != 0:
-                first_daily_candle = asset.get_daily_candle(first_daily_candle.get_open_time()+timedelta(days=(7-weekday)))
+                first_daily_candle = asset.get_daily_candle_from_datetime(first_daily_candle.get_open_time()+timedelta(days=(7-weekday)))
                 if first_daily_candle is None:
                     CONFIG.DATA_LOGGER.error("AssetUpdaterAggregation -> sync_asset_weekly() -> 2")
                     CONFIG.DATA_LOGGER.error(str(asset.as_dict()))
@@ -785,13 +836,17 @@ class AssetUpdaterAggregation(IntervalUpdater):
             else:
                 week_start = last_weekly_candle.get_open_time().date()+timedelta(days=7)
             week_end = week_start + timedelta(days=7)
+        if week_end < datetime.utcnow().date():
+            open_times, daily_candles = self.get_daily_candles(asset, week_start)
         while week_end < datetime.utcnow().date():
-            week_of_candles = Candle.get_asset_within(asset=asset, interval=INTERVAL_DAY, start=week_start, finish=week_end, exclude_finish=True)
+            first = bisect_left(open_times, datetime.combine(week_start, time.min))
+            last = bisect_left(open_times, datetime.combine(week_end, time.min))
+            week_of_candles = daily_candles[first:last]
             candles.append(self.aggregate_candles(asset, INTERVAL_WEEK, week_of_candles))
             week_start = week_start + timedelta(days=7)
             week_end = week_start + timedelta(days=7)
         if candles:
-            Candle.objects.insert(candles)
+            Candle.bulk_upsert(candles)
         CONFIG.DATA_LOGGER.info("AssetUpdaterAggregation -> sync_asset_weekly(%s) -> finish", asset.get_name())
         return [True, len(candles)]
 
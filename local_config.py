@@ -19,6 +19,15 @@ PORT = 5000
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "fam")
 # Whether or not tokens expire within the JWT
 TOKEN_EXPIRY = False
+# The number of PBKDF2 iterations used when hashing passwords
+PASSWORD_HASH_ITERATIONS = 200000
+# The number of seconds between reloading revoked tokens made by other processes
+REVOKED_TOKEN_REFRESH_INTERVAL = 5
+# The number of seconds each reload overlaps the previous one by, to allow for clock skew &
+# late inserts between processes
+REVOKED_TOKEN_REFRESH_OVERLAP = 60
+# The number of seconds between reloading all revoked tokens, catching any the reloads missed
+REVOKED_TOKEN_FULL_RELOAD_INTERVAL = 300
 
 ##########
 #DataLink#
@@ -0,0 +1,9 @@
+from mongoengine import connect
+
+from models.candle import Candle
+import local_config as CONFIG
+
+connect('FAM', host=CONFIG.MONGODB + "/" + CONFIG.DB)
+print("[Migration] Backfilling candle performance")
+UPDATED = Candle.backfill_performance_percent()
+print("[Migration] Updated " + str(UPDATED) + " candles")
@@ -0,0 +1,23 @@
+from mongoengine import connect
+from pymongo import UpdateOne
+
+from models.asset import Asset
+from models.trend import Trend
+import local_config as CONFIG
+
+connect('FAM', host=CONFIG.MONGODB + "/" + CONFIG.DB)
+print("[Migration] Embedding latest trend snapshots")
+COLLECTION = Asset._get_collection()
+# Assets synced before the latest trend was embedded hold a reference to it under 'latest_trend'
+LEGACY = list(COLLECTION.find({"latest_trend": {"$exists": True}}, {"latest_trend": 1}))
+TRENDS = Trend.objects.in_bulk([doc['latest_trend'] for doc in LEGACY if doc['latest_trend'] is not None])
+OPERATIONS = []
+for doc in LEGACY:
+    update = {"$unset": {"latest_trend": ""}}
+    trend = TRENDS.get(doc['latest_trend'])
+    if trend is not None:
+        update["$set"] = {"latest_trend_snapshot": trend.as_snapshot().to_mongo().to_dict()}
+    OPERATIONS.append(UpdateOne({"_id": doc['_id']}, update))
+if OPERATIONS:
+    COLLECTION.bulk_write(OPERATIONS, ordered=False)
+print("[Migration] Updated " + str(len(OPERATIONS)) + " assets")
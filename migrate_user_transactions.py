@@ -0,0 +1,10 @@
+from mongoengine import connect
+
+from models.user import User
+import local_config as CONFIG
+
+connect('FAM', host=CONFIG.MONGODB + "/" + CONFIG.DB)
+print("[Migration] Removing the legacy user transaction lists")
+# The Transactions are looked up by Transaction.user, so the lists are no longer read
+RESULT = User._get_collection().update_many({"transactions": {"$exists": True}}, {"$unset": {"transactions": ""}})
+print("[Migration] Updated " + str(RESULT.modified_count) + " users")
@@ -1,15 +1,44 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from time import time
+from typing import Dict, List, Tuple
 
 from bson import ObjectId
 from dateutil.relativedelta import relativedelta
-from mongoengine import Document, DateTimeField, FloatField, Q, ReferenceField, StringField
+from pymongo import UpdateOne
+from mongoengine import Document, DateTimeField, EmbeddedDocumentField, FloatField, Q, StringField
 
 from local_config import LIVE_UPDATE_INTERVAL
 from models.candle import Candle
 from models.constants import INTERVAL_DAY
-from models.trend import Trend
-
+from models.trend import Trend, TrendSnapshot
+
+INTERVAL_OFFSETS = (
+    ("1W", timedelta(weeks=1)),
+    ("1M", relativedelta(months=1)),
+    ("3M", relativedelta(months=3)),
+    ("6M", relativedelta(months=6)),
+    ("1Y", relativedelta(years=1)),
+    ("3Y", relativedelta(years=3))
+)
+LIST_BATCH_SIZE = 500
 OFFLINE_THRESHOLD = LIVE_UPDATE_INTERVAL*1.5
+PERFORMANCE_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=8)
+def _interval_dates(current: date) -> Dict[str, date]:
+    return {timeframe: current-offset for timeframe, offset in INTERVAL_OFFSETS}
+
+# The performance lookups are memoised for the lifetime of a request, as per
+# Asset.clear_performance_cache() - the Candles they read only change once a day
+
+@lru_cache(maxsize=PERFORMANCE_CACHE_SIZE)
+def _last_daily_candle(asset_id: ObjectId, current: date) -> 'Candle':
+    return Candle.get_asset_last_candle(asset_id, INTERVAL_DAY, True)
+
+@lru_cache(maxsize=PERFORMANCE_CACHE_SIZE)
+def _interval_performance(asset_id: ObjectId, price: float, current: date) -> Dict[str, float]:
+    return Asset.get_asset_interval_performance(asset_id, price, Asset.get_interval_dates(current))
 
 class Asset(Document):
     ticker = StringField(required=True)
@@ -17,12 +46,18 @@ class Asset(Document):
     price = FloatField()
     timestamp = DateTimeField()
     earliest_timestamp = DateTimeField()
-    latest_trend = ReferenceField('Trend')
+    # Embedded so reading an Asset doesn't dereference the Trend; this can't reuse the name of
+    # the legacy 'latest_trend' reference, which is left unread, hence the non-strict meta
+    latest_trend_snapshot = EmbeddedDocumentField(TrendSnapshot)
     latest_trend_timestamp = DateTimeField()
+    last_candle_open = FloatField()
+    last_candle_close = FloatField()
+    last_candle_timestamp = DateTimeField()
     meta = {
         'allow_inheritance': True,
+        'strict': False,
         'indexes': [
-            'ticker',
+            ('ticker', '_cls'),
             'name'
         ]
     }
@@ -37,7 +72,67 @@ class Asset(Document):
         Returns:
             QuerySet[Asset] -- An iterable QuerySet containing Assets in the collection which match the query.
         """
-        return Asset.objects(Q(name__istartswith=name) | Q(ticker__istartswith=name))
+        # Tickers are stored in upper case, so a case sensitive prefix can be bounded by the index
+        return Asset.objects(Q(name__istartswith=name) | Q(ticker__startswith=name.upper()))
+
+    @staticmethod
+    def bulk_update_prices(prices: List[Tuple[ObjectId, float, datetime]]) -> None:
+        """Updates the prices of many Assets with a single bulk write, rather than saving each Asset.
+        
+        Arguments:
+            prices {List[Tuple[ObjectId, float, datetime]]} -- The unique identifier of each Asset
+            with its new price and the timestamp of the price.
+        """
+        if not prices:
+            return
+        operations = [UpdateOne({"_id": asset_id}, {"$set": {"price": price, "timestamp": timestamp}}) for asset_id, price, timestamp in prices]
+        Asset._get_collection().bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def calculate_daily_performance(price: float, last_open: float, last_close: float) -> dict:
+        """Calculates the daily performance of an Asset given its current price and the prices of
+        its last market open daily Candle.
+        
+        Arguments:
+            price {float} -- The current price of the Asset.
+            last_open {float} -- The opening price of the last market open daily Candle.
+            last_close {float} -- The closing price of the last market open daily Candle.
+        
+        Returns:
+            dict -- A dictionary containing values for 'current', 'previous' and 'combined' reflecting
+            the percentage change as per get_daily_performance().
+        """
+        # Worked out inline as this runs for every Asset when serialising; matches calculate_percent_change()
+        previous = round(((last_close-last_open)/last_open)*100, 2)
+        if price is None:
+            return {"current": None, "previous": previous, "combined": None}
+        return {
+            "current": round(((price-last_close)/last_close)*100, 2),
+            "previous": previous,
+            "combined": round(((price-last_open)/last_open)*100, 2)
+        }
+
+    @staticmethod
+    def calculate_percent_change(current: float, base: float) -> float:
+        """Calculates the percentage change from a base price to the current price.
+        
+        Arguments:
+            current {float} -- The current price; None if unknown.
+            base {float} -- The price to compare to.
+        
+        Returns:
+            float -- The percentage change rounded to 2.d.p; None if the current price is unknown.
+        """
+        if current is None:
+            return None
+        return round(((current-base)/base)*100, 2)
+
+    @staticmethod
+    def clear_performance_cache() -> None:
+        """Clears the memoised Candle lookups behind the daily and interval performance.
+        """
+        _last_daily_candle.cache_clear()
+        _interval_performance.cache_clear()
 
     @staticmethod
     def get() -> 'QuerySet[Asset]':
@@ -60,25 +155,215 @@ class Asset(Document):
         """
         if not ObjectId.is_valid(identifier):
             return None
-        return Asset.objects(id=identifier).first()
+        # A primary key lookup doesn't need a QuerySet; _from_son() still builds the right subclass
+        doc = Asset._get_collection().find_one({"_id": ObjectId(identifier)})
+        if doc is None:
+            return None
+        return Asset._from_son(doc)
+
+    @staticmethod
+    def get_asset_interval_performance(asset_id: ObjectId, price: float, dates: Dict[str, date]) -> Dict[str, float]:
+        """Calculates the percentage change to the given price from the closing price of the given
+        Asset's daily Candle on each of the given dates, in a single aggregation.
+        
+        Arguments:
+            asset_id {ObjectId} -- The unique identifier of the Asset.
+            price {float} -- The price to compare to; None if unknown.
+            dates {Dict[str, date]} -- The dates to compare from keyed by a label, as per get_interval_dates().
+        
+        Returns:
+            Dict[str, float] -- The percentage change rounded to 2.d.p for each label; None for a label
+            if there is no Candle on that date.
+        """
+        if price is None:
+            return dict.fromkeys(dates)
+        # Only the change is sent back rather than the Candle; it's rounded here as $round needs MongoDB 4.2
+        change = {"$multiply": [{"$divide": [{"$subtract": [{"$literal": price}, "$close"]}, "$close"]}, 100]}
+        facets = {}
+        windows = []
+        for label, interval_date in dates.items():
+            start = datetime.combine(interval_date, datetime.min.time())
+            window = {"open_time": {"$gte": start, "$lt": start+timedelta(days=1)}}
+            windows.append(window)
+            facets[label] = [
+                {"$match": window},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "change": change}}
+            ]
+        pipeline = [
+            # Coalesced into the leading $match so only the requested days are read
+            {"$match": {"$or": windows}},
+            {"$facet": facets}
+        ]
+        start = min(dates.values())
+        finish = max(dates.values())+timedelta(days=1)
+        result = next(Candle.aggregate_asset_within(asset_id, pipeline, INTERVAL_DAY, start, finish), {})
+        changes = {label: candles[0]['change'] for label, candles in result.items() if candles}
+        return {label: (round(changes[label], 2) if label in changes else None) for label in dates}
+
+    @staticmethod
+    def get_interval_dates(current: date = None) -> Dict[str, date]:
+        """Returns the preset selection of dates the interval performance is measured from.
+        
+        Keyword Arguments:
+            current {date} -- The date to measure back from; today if not given. (default: {None})
+        
+        Returns:
+            Dict[str, date] -- The dates keyed by the timeframe they represent.
+        """
+        if current is None:
+            current = datetime.now().date()
+        # The dates only change once a day, so they're worked out once per date from the offsets
+        return dict(_interval_dates(current))
+
+    @staticmethod
+    def is_recent_timestamp(timestamp: datetime, interval: int = OFFLINE_THRESHOLD, now: float = None) -> bool:
+        """Returns whether a price timestamp falls within an optional specified interval of now.
+        
+        Arguments:
+            timestamp {datetime} -- The (naive UTC) timestamp of the price; None if never updated.
+            interval {int} -- The number of seconds to check for a recent update. (default: {OFFLINE_THRESHOLD})
+            now {float} -- The current time in epoch seconds, so a list of Assets can share a
+            single clock read; read from the clock if not given. (default: {None})
+        
+        Returns:
+            bool -- True if the timestamp is within the interval; False otherwise.
+        """
+        if timestamp is None:
+            return False
+        if now is None:
+            now = time()
+        # Timestamps are stored as naive UTC datetimes, so compare on epoch seconds
+        return (now-timestamp.replace(tzinfo=timezone.utc).timestamp()) < interval
+
+    @staticmethod
+    def iter_summary(result_set: 'QuerySet[Asset]' = None) -> 'QuerySet':
+        """Returns the summary details of Assets as raw documents straight from PyMongo, without
+        building (or dereferencing) any Asset objects.
+        
+        Keyword Arguments:
+            result_set {QuerySet[Asset]} -- The query to read the Assets for; all Assets if not given. (default: {None})
+        
+        Returns:
+            QuerySet -- An iterable QuerySet of the raw documents, to be used with summary_as_dict().
+        """
+        if result_set is None:
+            result_set = Asset.objects
+        # _cls (needed for the Asset class) is always loaded for inherited documents
+        return result_set.no_dereference().only('ticker', 'name', 'earliest_timestamp').as_pymongo().no_cache().batch_size(LIST_BATCH_SIZE)
+
+    @staticmethod
+    def list_as_dicts() -> List[dict]:
+        """Returns the details of all the Assets represented as dictionaries, as per as_dict().
+        
+        The details are read with a single aggregation straight from PyMongo, which also looks up
+        the Candles needed for the interval performance, so no Asset or Candle objects are built.
+        
+        Returns:
+            List[dict] -- A list of dictionaries representing the details of each Asset.
+        """
+        interval_dates = Asset.get_interval_dates()
+        now = time()
+        windows = []
+        for interval_date in interval_dates.values():
+            start = datetime.combine(interval_date, datetime.min.time())
+            windows.append({"open_time": {"$gte": start, "$lt": start+timedelta(days=1)}})
+        pipeline = [
+            {"$project": {
+                "_cls": 1,
+                "ticker": 1,
+                "name": 1,
+                "price": 1,
+                "timestamp": 1,
+                "earliest_timestamp": 1,
+                "last_candle_open": 1,
+                "last_candle_close": 1,
+                "last_candle_timestamp": 1
+            }},
+            {"$lookup": {
+                "from": Candle._get_collection_name(),
+                "let": {"asset": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$asset", "$$asset"]}, "interval": INTERVAL_DAY, "$or": windows}},
+                    {"$project": {"_id": 0, "open_time": 1, "close": 1}}
+                ],
+                "as": "interval_candles"
+            }}
+        ]
+        docs = list(Asset._get_collection().aggregate(pipeline, batchSize=LIST_BATCH_SIZE))
+        result = []
+        for doc in docs:
+            price = doc.get('price')
+            closes = {candle['open_time'].date(): candle['close'] for candle in doc.pop('interval_candles')}
+            if doc.get('last_candle_timestamp') is None:
+                # The DataLink hasn't denormalised the last candle yet so look it up instead
+                daily_performance = Asset._from_son(doc).get_daily_performance()
+            else:
+                daily_performance = Asset.calculate_daily_performance(price, doc['last_candle_open'], doc['last_candle_close'])
+            interval_performance = {}
+            for timeframe, interval_date in interval_dates.items():
+                base = closes.get(interval_date)
+                interval_performance[timeframe] = None if base is None else Asset.calculate_percent_change(price, base)
+            earliest_timestamp = doc.get('earliest_timestamp')
+            result.append({
+                "id": str(doc['_id']),
+                "name": doc.get('name'),
+                "ticker": doc.get('ticker'),
+                "price": doc.get('price'),
+                "class": doc['_cls'].split('.')[-1],
+                "price_timestamp": doc.get('timestamp'),
+                "has_recent_update": Asset.is_recent_timestamp(doc.get('timestamp'), now=now),
+                "daily_performance": daily_performance,
+                "interval_performance": interval_performance,
+                "earliest_date": None if earliest_timestamp is None else earliest_timestamp.date()
+            })
+        return result
+
+    @staticmethod
+    def summary_as_dict(doc: dict) -> dict:
+        """Returns the relevant autocomplete details of a raw Asset document as a dictionary,
+        as per as_dict_autocomplete().
+        
+        Arguments:
+            doc {dict} -- A raw Asset document as returned by iter_summary().
+        
+        Returns:
+            dict -- The relevant details of the Asset.
+        """
+        earliest_timestamp = doc.get('earliest_timestamp')
+        return {
+            "id": str(doc['_id']),
+            "name": doc.get('name'),
+            "ticker": doc.get('ticker'),
+            "class": doc['_cls'].split('.')[-1],
+            "earliest_date": None if earliest_timestamp is None else earliest_timestamp.date()
+        }
 
-    def as_dict(self) -> dict:
+    def as_dict(self, now: float = None) -> dict:
         """Returns the details of the Asset object represented as a dictionary.
         
+        Keyword Arguments:
+            now {float} -- The current time in epoch seconds, as per is_recent_timestamp(). (default: {None})
+        
         Returns:
             dict -- A dictionary representing the details of the Asset.
         """
+        # Read the stored values directly rather than through the field descriptors;
+        # this skips MongoEngine's conversion which is safe as nothing is written back
+        data = self._data
+        timestamp = data.get('timestamp')
+        earliest_timestamp = data.get('earliest_timestamp')
         return {
-            "id": self.get_id(),
-            "name": self.get_name(),
-            "ticker": self.get_ticker(),
-            "price": self.get_price(),
-            "class": self.get_asset_class(),
-            "price_timestamp": self.get_price_timestamp(),
-            "has_recent_update": self.has_recent_update(),
+            "id": str(data['id']),
+            "name": data.get('name'),
+            "ticker": data.get('ticker'),
+            "price": data.get('price'),
+            "class": type(self).__name__,
+            "price_timestamp": timestamp,
+            "has_recent_update": Asset.is_recent_timestamp(timestamp, now=now),
             "daily_performance": self.get_daily_performance(),
             "interval_performance": self.get_interval_performance(),
-            "earliest_date": self.get_earliest_timestamp()
+            "earliest_date": None if earliest_timestamp is None else earliest_timestamp.date()
         }
 
     def as_dict_autocomplete(self) -> dict:
@@ -87,12 +372,14 @@ class Asset(Document):
         Returns:
             dict -- The relevant details of the Asset.
         """
+        data = self._data
+        earliest_timestamp = data.get('earliest_timestamp')
         return {
-            "id": self.get_id(),
-            "name": self.get_name(),
-            "ticker": self.get_ticker(),
-            "class": self.get_asset_class(),
-            "earliest_date": self.get_earliest_timestamp()
+            "id": str(data['id']),
+            "name": data.get('name'),
+            "ticker": data.get('ticker'),
+            "class": type(self).__name__,
+            "earliest_date": None if earliest_timestamp is None else earliest_timestamp.date()
         }
 
     def compare_candle_percent(self, candle: 'Asset', use_close: bool = True) -> float:
@@ -105,11 +392,20 @@ class Asset(Document):
         Returns:
             float -- The percentage change.
         """
-        if self.get_price() is None:
-            return None
         if use_close:
-            return round(((self.get_price()-candle.get_close())/candle.get_close())*100, 2)
-        return round(((self.get_price()-candle.get_open())/candle.get_open())*100, 2)
+            return self.compare_price_percent(candle.get_close())
+        return self.compare_price_percent(candle.get_open())
+
+    def compare_price_percent(self, price: float) -> float:
+        """Calculates the percentage change between the current asset price and a given price.
+        
+        Arguments:
+            price {float} -- The price to compare to.
+        
+        Returns:
+            float -- The percentage change.
+        """
+        return Asset.calculate_percent_change(self.get_price(), price)
 
     def get_asset_class(self) -> str:
         """Returns the Asset class of the given asset.
@@ -117,7 +413,8 @@ class Asset(Document):
         Returns:
             str -- The name of the Asset class.
         """
-        return self._cls.split('.')[1]
+        # Documents are loaded as their subclass, whose name is the last part of _cls
+        return type(self).__name__
 
     def get_candles(self, interval: int = INTERVAL_DAY) -> 'QuerySet[Candle]':
         """Returns the candles for the asset on the given Candle interval.
@@ -130,7 +427,7 @@ class Asset(Document):
         """
         return Candle.get_asset(self, interval)
 
-    def get_candles_within(self, interval: int = INTERVAL_DAY, start: datetime = datetime.min, finish: datetime = datetime.max, exclude_start: bool = False, exclude_finish: bool = False, exclude_filler: bool = False) -> 'QuerySet[Candle]':
+    def get_candles_within(self, interval: int = INTERVAL_DAY, start: datetime = datetime.min, finish: datetime = datetime.max, exclude_start: bool = False, exclude_finish: bool = False, exclude_filler: bool = False, fields: List[str] = None) -> 'QuerySet[Candle]':
         """Returns the candles for the asset on the given Candle interval within the timeframe specified.
         
         Keyword Arguments:
@@ -140,25 +437,35 @@ class Asset(Document):
             exclude_start {bool} -- Whether to exclude the start datetime from the interval. (default: {False})
             exclude_finish {bool} -- Whether to exclude the finish datetime from the interval. (default: {False})
             exclude_filler {bool} -- Whether to exclude filler candles from the results. (default: {False})
+            fields {List[str]} -- The only fields of the Candles to load; all if not given. (default: {None})
         
         Returns:
             QuerySet[Candle] -- An iterable QuerySet containing Candles in the collection which match the query.
         """
-        return Candle.get_asset_within(self, interval=interval, start=start, finish=finish, exclude_start=exclude_start, exclude_finish=exclude_finish, exclude_filler=exclude_filler)
+        return Candle.get_asset_within(self, interval=interval, start=start, finish=finish, exclude_start=exclude_start, exclude_finish=exclude_finish, exclude_filler=exclude_filler, fields=fields)
 
-    def get_daily_candle(self, date: datetime) -> 'Candle':
+    def get_daily_candle(self, date: date) -> 'Candle':
         """Returns the model.constants.INTERVAL_DAY candle for the given date.
         
         Arguments:
-            date {datetime/date} -- The datetime (date extracted) or date for which the Candle is required.
+            date {date} -- The date for which the Candle is required; use get_daily_candle_from_datetime()
+            for a datetime.
+        
+        Returns:
+            Candle -- The daily Candle object matching the query.
+        """
+        return Candle.get_asset_within(self, INTERVAL_DAY, date, date+timedelta(days=1), False, True).first()
+
+    def get_daily_candle_from_datetime(self, timestamp: datetime) -> 'Candle':
+        """Returns the model.constants.INTERVAL_DAY candle for the date of the given datetime.
+        
+        Arguments:
+            timestamp {datetime} -- The datetime whose date the Candle is required for.
         
         Returns:
             Candle -- The daily Candle object matching the query.
         """
-        if isinstance(date, datetime):
-            date = date.date()
-        next_date = date+timedelta(days=1)
-        return Candle.get_asset_within(self, INTERVAL_DAY, date, next_date, False, True).first()
+        return self.get_daily_candle(timestamp.date())
 
     def get_daily_performance(self) -> dict:
         """Calculates and returns the percentage change on the previous days' trade and the current
@@ -168,14 +475,15 @@ class Asset(Document):
             dict -- A dictionary containing values for 'previous' and 'current' reflecting
             the percentage change as specified.
         """
-        last_candle = self.get_last_candle(market_open=True)
-        if last_candle is None:
-            return None
-        return {
-            "current": self.compare_candle_percent(last_candle),
-            "previous": last_candle.get_performance_percent(),
-            "combined": self.compare_candle_percent(last_candle, False)
-        }
+        data = self._data
+        if data.get('last_candle_timestamp') is None:
+            # The DataLink hasn't denormalised the last candle yet so look it up instead
+            last_candle = _last_daily_candle(self.pk, datetime.utcnow().date())
+            if last_candle is None:
+                return None
+            last_data = last_candle._data
+            return Asset.calculate_daily_performance(data.get('price'), last_data.get('open'), last_data.get('close'))
+        return Asset.calculate_daily_performance(data.get('price'), data.get('last_candle_open'), data.get('last_candle_close'))
 
     def get_earliest_timestamp(self) -> datetime:
         """Returns the earliest date timestamp on a candle for the Asset.
@@ -213,15 +521,7 @@ class Asset(Document):
         Returns:
             dict -- A dictionary containing the timeframe and the percentage performance.
         """
-        current = datetime.now().date()
-        return {
-            "1W": self.get_percent_change(current-timedelta(weeks=1)),
-            "1M": self.get_percent_change(current-relativedelta(months=1)),
-            "3M": self.get_percent_change(current-relativedelta(months=3)),
-            "6M": self.get_percent_change(current-relativedelta(months=6)),
-            "1Y": self.get_percent_change(current-relativedelta(years=1)),
-            "3Y": self.get_percent_change(current-relativedelta(years=3))
-        }
+        return dict(_interval_performance(self.pk, self.get_price(), datetime.now().date()))
 
     def get_name(self) -> str:
         """Returns the full name of the asset.
@@ -243,13 +543,13 @@ class Asset(Document):
         """
         return Candle.get_asset_last_candle(self, interval, market_open)
 
-    def get_latest_trend(self) -> 'Trend':
-        """Returns the latest Google Trends object.
+    def get_latest_trend(self) -> 'TrendSnapshot':
+        """Returns a snapshot of the latest Google Trends object.
         
         Returns:
-            Trend -- The latest Trend object.
+            TrendSnapshot -- The latest Trend data embedded in the Asset.
         """
-        return self.latest_trend
+        return self.latest_trend_snapshot
 
     def get_latest_trend_timestamp(self) -> datetime:
         """Returns the timestamp of the latest Trends update for the Asset.
@@ -259,21 +559,6 @@ class Asset(Document):
         """
         return self.latest_trend_timestamp
 
-    def get_percent_change(self, date: datetime, use_close: bool = True) -> float:
-        """Returns the percentage change in price from the specified date.
-        
-        Arguments:
-            date {datetime} -- The date to compare the current price to.
-            use_close {bool} -- Whether to use the close_price for comparison (True) or open price (False).
-        
-        Returns:
-            float -- The percentage change in price.
-        """
-        old_candle = self.get_daily_candle(date)
-        if old_candle is None:
-            return None
-        return self.compare_candle_percent(old_candle, use_close)
-
     def get_price(self) -> float:
         """Returns the most recently updated price for the Asset.
         
@@ -310,17 +595,17 @@ class Asset(Document):
         """
         return Trend.get_trends(search_term=self.get_name(), start=start, finish=finish)
 
-    def has_recent_update(self, interval: int = (OFFLINE_THRESHOLD)) -> bool:
+    def has_recent_update(self, interval: int = (OFFLINE_THRESHOLD), now: float = None) -> bool:
         """Returns whether the asset current price has been updated recently within an optional specified interval.
         
         Keyword Arguments:
             interval {int} -- The number of seconds to check for a recent update. (default: {INTERVAL_MINUTE*10})
+            now {float} -- The current time in epoch seconds, as per is_recent_timestamp(). (default: {None})
         
         Returns:
             bool -- True if an update has occurred within the interval; False otherwise.
         """
-        last_update_diff = ((datetime.utcnow()-self.timestamp).total_seconds())
-        return last_update_diff < interval
+        return Asset.is_recent_timestamp(self.timestamp, interval, now)
 
     def set_earliest_timestamp(self, timestamp: datetime) -> None:
         """Sets the earliest timestamp on a candle for the Asset.
@@ -354,10 +639,21 @@ class Asset(Document):
         if earliest_candle is not None:
             self.set_earliest_timestamp(earliest_candle.get_open_time())
 
+    def update_last_candle(self) -> None:
+        """Update the stored details of the last daily Candle on which the market was open,
+        so the daily performance can be calculated without looking up the Candle.
+        """
+        last_candle = self.get_last_candle(market_open=True)
+        if last_candle is not None:
+            self.last_candle_open = last_candle.get_open()
+            self.last_candle_close = last_candle.get_close()
+            self.last_candle_timestamp = last_candle.get_open_time()
+
     def update_latest_trend(self) -> None:
         """Update the latest Trend object for the asset.
         """
-        self.latest_trend = Trend.get_latest_trend(self.get_name())
+        latest_trend = Trend.get_latest_trend(self.get_name())
+        self.latest_trend_snapshot = None if latest_trend is None else latest_trend.as_snapshot()
         self.latest_trend_timestamp = datetime.utcnow()
 
 class Currency(Asset):
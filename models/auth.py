@@ -1,15 +1,71 @@
-from hashlib import sha256
+from datetime import datetime
+from hashlib import pbkdf2_hmac, sha256
 from secrets import token_hex
+from threading import Lock
+from time import time
+import hmac
 
+from bson import ObjectId
 from flask_jwt_extended import create_access_token, create_refresh_token
-from mongoengine import Document, StringField
+from mongoengine import Document, IntField, StringField
 
-from local_config import TOKEN_EXPIRY
+from local_config import PASSWORD_HASH_ITERATIONS, REVOKED_TOKEN_FULL_RELOAD_INTERVAL, REVOKED_TOKEN_REFRESH_INTERVAL, REVOKED_TOKEN_REFRESH_OVERLAP, TOKEN_EXPIRY
+
+SALT_BYTES = 16
+
+# Revoked tokens are checked on every authenticated request, so they're kept in memory and
+# only the tokens revoked since the last refresh are read from the collection, plus all of them
+# periodically; the set is replaced rather than modified so it can be read without the lock
+_REVOKED_TOKENS_LOCK = Lock()
+_revoked_tokens = frozenset()
+_revoked_tokens_refreshed = None
+_revoked_tokens_reloaded = None
+
+def _add_revoked_tokens(tokens: set) -> None:
+    global _revoked_tokens
+    with _REVOKED_TOKENS_LOCK:
+        _revoked_tokens = _revoked_tokens | tokens
+
+def _read_revoked_tokens(query: dict) -> set:
+    return {doc['jti'] for doc in AuthRevokedToken._get_collection().find(query, {"_id": 0, "jti": 1})}
+
+def _refresh_revoked_tokens() -> None:
+    global _revoked_tokens, _revoked_tokens_refreshed, _revoked_tokens_reloaded
+    with _REVOKED_TOKENS_LOCK:
+        now = time()
+        if _revoked_tokens_refreshed is None:
+            # Nothing can be checked until the first load, so only it is read while holding the lock
+            _revoked_tokens = _revoked_tokens | _read_revoked_tokens({})
+            _revoked_tokens_refreshed = now
+            _revoked_tokens_reloaded = now
+            return
+        if now-_revoked_tokens_refreshed < REVOKED_TOKEN_REFRESH_INTERVAL:
+            return
+        previous_refresh = _revoked_tokens_refreshed
+        previous_reload = _revoked_tokens_reloaded
+        # Claimed before querying so other requests don't also query in the meantime
+        _revoked_tokens_refreshed = now
+        if now-previous_reload >= REVOKED_TOKEN_FULL_RELOAD_INTERVAL:
+            _revoked_tokens_reloaded = now
+            query = {}
+        else:
+            # Overlap with the previous refresh as ObjectIds from other processes aren't strictly ordered
+            since = datetime.utcfromtimestamp(previous_refresh-REVOKED_TOKEN_REFRESH_OVERLAP)
+            query = {"_id": {"$gte": ObjectId.from_datetime(since)}}
+    try:
+        tokens = _read_revoked_tokens(query)
+    except Exception:
+        with _REVOKED_TOKENS_LOCK:
+            _revoked_tokens_refreshed = previous_refresh
+            _revoked_tokens_reloaded = previous_reload
+        raise
+    _add_revoked_tokens(tokens)
 
 class Auth(Document):
     email = StringField(required=True, unique=True)
     password = StringField()
     salt = StringField()
+    iterations = IntField()
 
     @staticmethod
     def authenticate(email: str, password: str) -> 'Auth':
@@ -22,12 +78,19 @@ class Auth(Document):
         Returns:
             Auth -- Returns the relevant Auth object if valid; None otherwise.
         """
-        user = Auth.objects(email=email).first()
-        if user is None:
+        # Only read what's needed to verify the password; the email is filled in from the query
+        # so the returned Auth can still be validated & saved
+        doc = Auth._get_collection().find_one({"email": email}, {"password": 1, "salt": 1, "iterations": 1})
+        if doc is None:
             return None
-        salted_password = str(password + user.get_salt()).encode('utf8')
-        hash_password = sha256(salted_password).hexdigest()
-        if hash_password == user.get_password():
+        doc['email'] = email
+        user = Auth._from_son(doc)
+        hash_password = Auth.hash_password(password, user.get_salt(), user.get_iterations())
+        if hmac.compare_digest(hash_password, user.get_password()):
+            if user.get_iterations() is None:
+                # Rehash passwords stored with the legacy single round of SHA-256
+                user.update_password(password)
+                user.save()
             return user
         return None
 
@@ -42,11 +105,10 @@ class Auth(Document):
         Returns:
             Auth -- An Authentication object reflecting the given credentials.
         """
-        salt = token_hex(8)
-        salted_password = str(password+salt).encode('utf8')
-        hash_password = sha256(salted_password).hexdigest()
+        salt = token_hex(SALT_BYTES)
+        hash_password = Auth.hash_password(password, salt, PASSWORD_HASH_ITERATIONS)
         try:
-            new_auth = Auth(email=email, password=hash_password, salt=salt)
+            new_auth = Auth(email=email, password=hash_password, salt=salt, iterations=PASSWORD_HASH_ITERATIONS)
             new_auth.save()
         except Exception:
             return None
@@ -91,6 +153,26 @@ class Auth(Document):
         """
         return Auth.objects(email=email).first()
 
+    @staticmethod
+    def hash_password(password: str, salt: str, iterations: int = None) -> str:
+        """Returns the salted hash of the given password.
+        
+        Arguments:
+            password {str} -- The plaintext password.
+            salt {str} -- The salt to hash the password with.
+            iterations {int} -- The number of PBKDF2 iterations; None for the legacy single round
+            of SHA-256. (default: {None})
+        
+        Returns:
+            str -- The hashed password as a hex string.
+        """
+        password = password.encode('utf8')
+        # The salt is a hex string, so its ASCII bytes are the bytes it has always been hashed with
+        salt = salt.encode('ascii')
+        if iterations is None:
+            return sha256(password + salt).hexdigest()
+        return pbkdf2_hmac('sha256', password, salt, iterations).hex()
+
     def get_email(self) -> str:
         """Returns the email associated with the authentication object.
         
@@ -99,6 +181,14 @@ class Auth(Document):
         """
         return self.email
 
+    def get_iterations(self) -> int:
+        """Returns the number of PBKDF2 iterations used for hashing the password.
+        
+        Returns:
+            int -- The number of iterations; None if the password uses the legacy hash.
+        """
+        return self.iterations
+
     def get_password(self) -> str:
         """Returns the salted & hashed password associated with the Auth object.
         
@@ -115,6 +205,14 @@ class Auth(Document):
         """
         return self.salt
 
+    def set_iterations(self, iterations: int) -> None:
+        """Sets the number of PBKDF2 iterations used for hashing the password.
+        
+        Arguments:
+            iterations {int} -- The number of iterations.
+        """
+        self.iterations = iterations
+
     def set_password(self, password: str) -> None:
         """Sets the password field of the authentication object - this method
         doesn't salt or hash.
@@ -139,9 +237,9 @@ class Auth(Document):
         Arguments:
             password {str} -- The plaintext password the user wishes to set it to.
         """
-        self.set_salt(token_hex(8))
-        salted_password = str(password+self.get_salt()).encode("utf8")
-        self.set_password(sha256(salted_password).hexdigest())
+        self.set_salt(token_hex(SALT_BYTES))
+        self.set_iterations(PASSWORD_HASH_ITERATIONS)
+        self.set_password(Auth.hash_password(password, self.get_salt(), self.get_iterations()))
 
 class AuthRevokedToken(Document):
     jti = StringField(required=True, unique=True)
@@ -161,6 +259,7 @@ class AuthRevokedToken(Document):
         """
         new_token = AuthRevokedToken(jti=token)
         new_token.save()
+        _add_revoked_tokens({token})
 
     @staticmethod
     def has_token(token: str) -> bool:
@@ -172,4 +271,7 @@ class AuthRevokedToken(Document):
         Returns:
             bool -- True if it has been blacklisted; False otherwise.
         """
-        return AuthRevokedToken.objects(jti=token).first() is not None
+        if token in _revoked_tokens:
+            return True
+        _refresh_revoked_tokens()
+        return token in _revoked_tokens
@@ -1,8 +1,18 @@
-from datetime import datetime
+from datetime import datetime, time
+from typing import Dict, List
+
+from bson import ObjectId
 from mongoengine import DateTimeField, Document, FloatField, IntField, LazyReferenceField, Q
+from pymongo import UpdateOne
 
+from local_config import DATA_LOGGER
 from .constants import INTERVAL_DAY
 
+# Equality on the asset & interval then a range on the open time
+ASSET_WITHIN_INDEX = [('asset', 1), ('interval', 1), ('open_time', 1)]
+BACKFILL_BATCH_SIZE = 1000
+DICT_FIELDS = ['open', 'close', 'high', 'low', 'volume', 'open_time', 'interval']
+
 class Candle(Document):
     asset = LazyReferenceField('Asset', required=True)
     open = FloatField()
@@ -12,32 +22,155 @@ class Candle(Document):
     volume = FloatField()
     open_time = DateTimeField()
     interval = IntField()
+    performance_percent = FloatField()
 
     meta = {
         'ordering': ['-open_time'],
         'indexes': [
-            'asset',
-            'open_time',
-            'interval'
+            # Every query matches on the asset & interval, so this replaces the single field indexes
+            ('asset', 'interval', 'open_time'),
+            # Filler candles are stored without an open price, so this only covers
+            # the candles on which the market was open
+            {
+                'fields': ['asset', 'interval', '-open_time'],
+                'partialFilterExpression': {'open': {'$exists': True}}
+            }
         ]
     }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Candles are written through QuerySet.insert() as well as save(), so the performance is
+        # worked out when a new Candle is built rather than when it is written
+        if self._created and self._data.get('performance_percent') is None:
+            self._data['performance_percent'] = Candle.calculate_performance_percent(self._data.get('open'), self._data.get('close'))
+
     def as_dict(self) -> dict:
         """Returns the details of the Candle object represented as a dictionary.
         
         Returns:
             dict -- Details of the Candle object.
         """
+        # Read the stored values directly rather than through the field descriptors;
+        # this skips MongoEngine's conversion which is safe as nothing is written back
+        data = self._data
         return {
-            "open": self.get_open(),
-            "close": self.get_close(),
-            "high": self.get_high(),
-            "low": self.get_low(),
-            "volume": self.get_volume(),
-            "open_time": self.get_open_time(),
-            "interval": self.get_interval()
+            "open": data.get('open'),
+            "close": data.get('close'),
+            "high": data.get('high'),
+            "low": data.get('low'),
+            "volume": data.get('volume'),
+            "open_time": data.get('open_time'),
+            "interval": data.get('interval')
         }
 
+    @staticmethod
+    def aggregate_asset_within(asset: 'Asset', pipeline: List[dict], interval: int = INTERVAL_DAY, start: datetime = datetime.min, finish: datetime = datetime.max) -> 'CommandCursor':
+        """Runs an aggregation pipeline over the candles for the given asset and interval within the
+        specified timeframe. The timeframe is matched as the first stage so that the indexes on
+        the collection are used - any projections must come after it in the pipeline.
+        
+        Arguments:
+            asset {Asset/ObjectId} -- The Asset collection object or its unique identifier.
+            pipeline {List[dict]} -- The aggregation stages to run on the matched candles.
+            interval {int} -- The number of seconds each candle represents. (default: {INTERVAL_DAY})
+            start {datetime} -- The starting datetime of the interval (inclusive). (default: {datetime.min})
+            finish {datetime} -- The finishing datetime of the interval (exclusive). (default: {datetime.max})
+        
+        Returns:
+            CommandCursor -- An iterable cursor over the resulting documents.
+        """
+        # Raw queries aren't converted by MongoEngine, so ensure dates are compared as datetimes
+        if not isinstance(start, datetime):
+            start = datetime.combine(start, time.min)
+        if not isinstance(finish, datetime):
+            finish = datetime.combine(finish, time.min)
+        match = {
+            "asset": asset if isinstance(asset, ObjectId) else asset.pk,
+            "interval": int(interval),
+            "open_time": {"$gte": start, "$lt": finish}
+        }
+        return Candle._get_collection().aggregate([{"$match": match}] + pipeline)
+
+    @staticmethod
+    def backfill_performance_percent() -> int:
+        """Stores the performance percent on the market open Candles which were written without one;
+        this is a one-off migration, as per migrate_candle_performance.py.
+        
+        Returns:
+            int -- The number of Candles updated.
+        """
+        collection = Candle._get_collection()
+        query = {"open": {"$exists": True}, "performance_percent": {"$exists": False}}
+        operations = []
+        updated = 0
+        for doc in collection.find(query, {"open": 1, "close": 1}).batch_size(BACKFILL_BATCH_SIZE):
+            # Candles it can't be calculated for (e.g. an open of 0) are stored with an explicit null
+            # so that they aren't matched again
+            performance_percent = Candle.calculate_performance_percent(doc.get('open'), doc.get('close'))
+            operations.append(UpdateOne({"_id": doc['_id']}, {"$set": {"performance_percent": performance_percent}}))
+            if len(operations) == BACKFILL_BATCH_SIZE:
+                collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        return updated
+
+    @staticmethod
+    def bulk_upsert(candles: List['Candle']) -> int:
+        """Writes the given new Candles in unordered batches, skipping any which have already been
+        stored for the same asset, interval & open time so that a sync can safely be re-run.
+        
+        Arguments:
+            candles {List[Candle]} -- The new Candles to be written.
+        
+        Returns:
+            int -- The number of Candles which were inserted; Candles without an open time (such as
+            an aggregate of a period without any market open Candles) are skipped.
+        """
+        operations = []
+        for candle in candles:
+            doc = candle.to_mongo().to_dict()
+            doc.pop('_id', None)
+            if doc.get('open_time') is None:
+                DATA_LOGGER.warning("Candle -> bulk_upsert() -> skipped candle without an open time: %s", doc)
+                continue
+            key = {"asset": doc['asset'], "interval": doc['interval'], "open_time": doc['open_time']}
+            operations.append(UpdateOne(key, {"$setOnInsert": doc}, upsert=True))
+        if not operations:
+            return 0
+        return Candle._get_collection().bulk_write(operations, ordered=False).upserted_count
+
+    @staticmethod
+    def calculate_performance_percent(open_price: float, close_price: float) -> float:
+        """Calculates the percentage change over the course of a Candle.
+        
+        Arguments:
+            open_price {float} -- The opening price of the Candle; None for a filler Candle.
+            close_price {float} -- The closing price of the Candle.
+        
+        Returns:
+            float -- Percent change from open to close, rounded to 2.d.p; None if it cannot be calculated.
+        """
+        if not open_price or close_price is None:
+            return None
+        return round(((close_price-open_price)/open_price)*100, 2)
+
+    @staticmethod
+    def document_as_dict(doc: dict) -> dict:
+        """Returns the details of a raw Candle document as a dictionary, as per as_dict().
+        
+        Arguments:
+            doc {dict} -- A raw Candle document, such as from a QuerySet projected to DICT_FIELDS
+            with as_pymongo().
+        
+        Returns:
+            dict -- Details of the Candle.
+        """
+        return {field: doc.get(field) for field in DICT_FIELDS}
+
     @staticmethod
     def get_asset(asset: 'Asset', interval: int = INTERVAL_DAY, exclude_filler: bool = False) -> 'QuerySet[Candle]':
         """Returns a list of candles given the asset and the interval.
@@ -51,11 +184,34 @@ class Candle(Document):
             QuerySet[Candle] -- An iterable QuerySet containing objects in the collection matching the query.
         """
         if exclude_filler:
-            return Candle.objects(asset=asset, interval=interval, open__ne=None)
+            return Candle.objects(asset=asset, interval=interval, open__exists=True)
         return Candle.objects(asset=asset, interval=interval)
 
     @staticmethod
-    def get_asset_within(asset: 'Asset', interval: int = INTERVAL_DAY, start: datetime = datetime.min, finish: datetime = datetime.max, exclude_start: bool = False, exclude_finish: bool = False, exclude_filler: bool = False) -> 'QuerySet[Candle]':
+    def get_asset_closes(asset_ids: List[ObjectId], interval: int = INTERVAL_DAY, start: datetime = datetime.min, finish: datetime = datetime.max) -> List[dict]:
+        """Returns the closing prices of the given assets within the specified timeframe, reading only
+        the open time & close of each candle in a single query.
+        
+        Arguments:
+            asset_ids {List[ObjectId]} -- The unique identifiers of the Assets.
+            interval {int} -- The number of seconds each candle represents. (default: {INTERVAL_DAY})
+            start {datetime} -- The starting datetime of the interval (inclusive). (default: {datetime.min})
+            finish {datetime} -- The finishing datetime of the interval (exclusive). (default: {datetime.max})
+        
+        Returns:
+            List[dict] -- The chronological open times and the matching closing prices of the
+            candles, each as a list keyed by the unique identifier of the Asset.
+        """
+        query = Candle.objects(asset__in=list(asset_ids), interval=interval, open_time__gte=start, open_time__lt=finish)
+        open_times = {asset_id: [] for asset_id in asset_ids}
+        closes = {asset_id: [] for asset_id in asset_ids}
+        for candle in query.only('asset', 'open_time', 'close').order_by('open_time').as_pymongo():
+            open_times[candle['asset']].append(candle['open_time'])
+            closes[candle['asset']].append(candle['close'])
+        return [open_times, closes]
+
+    @staticmethod
+    def get_asset_within(asset: 'Asset', interval: int = INTERVAL_DAY, start: datetime = datetime.min, finish: datetime = datetime.max, exclude_start: bool = False, exclude_finish: bool = False, exclude_filler: bool = False, fields: List[str] = None) -> 'QuerySet[Candle]':
         """Returns the candles for the given asset and interval within the specified timeframe.
         
         Arguments:
@@ -66,6 +222,7 @@ class Candle(Document):
             exclude_start {bool} -- Whether to exclude the start datetime from the interval. (default: {False})
             exclude_finish {bool} -- Whether to exclude the finish datetime from the interval. (default: {False})
             exclude_filler {bool} -- Whether to exclude filler candles from the results. (default: {False})
+            fields {List[str]} -- The only fields of the candles to load; all if not given. (default: {None})
     
         Returns:
             QuerySet[Candle] -- An iterable QuerySet containing objects in the collection matching the query.
@@ -74,7 +231,9 @@ class Candle(Document):
             start = datetime.min
         if finish is None:
             finish = datetime.max
-        result_set = Candle.get_asset(asset=asset, interval=interval, exclude_filler=exclude_filler)
+        result_set = Candle.get_asset(asset=asset, interval=interval, exclude_filler=exclude_filler).hint(ASSET_WITHIN_INDEX)
+        if fields is not None:
+            result_set = result_set.only(*fields)
         if exclude_start and exclude_finish:
             return result_set.filter(Q(open_time__gt=start) & Q(open_time__lt=finish))
         if exclude_start:
@@ -101,7 +260,7 @@ class Candle(Document):
         """Returns the last candle (date-timewise) for the asset with the given interval.
         
         Arguments:
-            asset {Asset} -- The Asset collection object.
+            asset {Asset/ObjectId} -- The Asset collection object or its unique identifier.
             interval {int} -- The number of seconds each candle represents. (default: {INTERVAL_DAY})
             market_open {bool} -- Whether the market needs to be open on the provided candle - i.e. not filler candle. (default: {False})
         
@@ -109,16 +268,41 @@ class Candle(Document):
             Candle -- The Candle object representing the most recent for the interval; None if doesn't exist.
         """
         if market_open:
-            return Candle.objects(asset=asset, interval=interval, open__ne=None).first()
+            return Candle.objects(asset=asset, interval=interval, open__exists=True).first()
         return Candle.objects(asset=asset, interval=interval).first()
 
+    @staticmethod
+    def get_last_candles(assets: List['Asset'], interval: int = INTERVAL_DAY) -> Dict[ObjectId, 'Candle']:
+        """Returns the last candle (date-timewise) for each of the given assets with the given interval,
+        looked up together in a single aggregation.
+        
+        Arguments:
+            assets {List[Asset]} -- The Asset collection objects.
+            interval {int} -- The number of seconds each candle represents. (default: {INTERVAL_DAY})
+        
+        Returns:
+            Dict[ObjectId, Candle] -- The most recent Candle keyed by the unique identifier of its Asset;
+            Assets without a Candle for the interval are left out.
+        """
+        pipeline = [
+            {"$match": {"asset": {"$in": [asset.pk for asset in assets]}, "interval": int(interval)}},
+            # The exact reverse of the (asset, interval, open_time) index, so the sort is served by
+            # walking it backwards rather than in memory; the first of each group is the latest
+            {"$sort": {"asset": -1, "interval": -1, "open_time": -1}},
+            {"$group": {"_id": "$asset", "candle": {"$first": "$$ROOT"}}}
+        ]
+        return {doc['_id']: Candle._from_son(doc['candle']) for doc in Candle._get_collection().aggregate(pipeline)}
+
+    # The getters are on the hot path of the performance calculations, so they read the
+    # stored values directly rather than through the field descriptors
+
     def get_close(self) -> float:
         """Returns the closing price of the Candle.
         
         Returns:
             float -- Closing price of the Candle.
         """
-        return self.close
+        return self._data.get('close')
 
     def get_high(self) -> float:
         """Returns the high price in the Candle.
@@ -126,7 +310,7 @@ class Candle(Document):
         Returns:
             float -- High price in the Candle.
         """
-        return self.high
+        return self._data.get('high')
 
     def get_interval(self) -> float:
         """Returns the number of seconds the candle lasted for.
@@ -134,7 +318,7 @@ class Candle(Document):
         Returns:
             int -- Number of seconds the candle represents.
         """
-        return self.interval
+        return self._data.get('interval')
 
     def get_low(self) -> float:
         """Returns the low price of the Candle.
@@ -142,7 +326,7 @@ class Candle(Document):
         Returns:
             float -- Low price of the candle.
         """
-        return self.low
+        return self._data.get('low')
 
     def get_open(self) -> float:
         """Returns the opening price of the Candle.
@@ -150,7 +334,7 @@ class Candle(Document):
         Returns:
             float -- Opening price of the Candle.
         """
-        return self.open
+        return self._data.get('open')
 
     def get_open_time(self) -> datetime:
         """Returns the opening time of the Candle.
@@ -158,7 +342,7 @@ class Candle(Document):
         Returns:
             datetime -- Opening time of the Candle representing in UTC.
         """
-        return self.open_time
+        return self._data.get('open_time')
 
     def get_performance_percent(self) -> float:
         """Returns the percentage change over the course of the Candle.
@@ -166,7 +350,11 @@ class Candle(Document):
         Returns:
             float -- Percent change from open to close for the candle, rounded to 2.d.p.
         """
-        return round(((self.get_close()-self.get_open())/self.get_open())*100, 2)
+        performance_percent = self._data.get('performance_percent')
+        if performance_percent is None:
+            open_price = self.get_open()
+            return round(((self.get_close()-open_price)/open_price)*100, 2)
+        return performance_percent
 
     def get_volume(self) -> float:
         """Returns the units of volume associated with the Candle.
@@ -174,4 +362,4 @@ class Candle(Document):
         Returns:
             float -- Volume of the candle; None if not provided.
         """
-        return self.volume
+        return self._data.get('volume')
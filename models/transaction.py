@@ -1,11 +1,14 @@
 from datetime import datetime
+from typing import Dict, List
 
 from bson import ObjectId
-from mongoengine import DateTimeField, Document, FloatField, LazyReferenceField, ReferenceField
+from mongoengine import DateTimeField, Document, FloatField, LazyReferenceField
+
+from models.asset import Asset
 
 class Transaction(Document):
     user = LazyReferenceField('User', required=True)
-    asset = ReferenceField('Asset', required=True)
+    asset = LazyReferenceField('Asset', required=True)
     quantity = FloatField(required=True)
     buy_date = DateTimeField(required=True)
     buy_price = FloatField(required=True)
@@ -38,9 +41,6 @@ class Transaction(Document):
         try:
             transaction = Transaction(user=user, asset=asset, quantity=quantity, buy_date=date_purchased, buy_price=price_purchased, sell_date=date_sold, sell_price=price_sold)
             transaction.save()
-            user.add_transaction(transaction)
-            user.set_portfolio_historical(None)
-            user.save()
         except Exception:
             return None
         return transaction
@@ -56,10 +56,6 @@ class Transaction(Document):
             bool -- Returns True if the deletion was successful; False otherwise.
         """
         try:
-            user = transaction.get_user()
-            user.delete_transaction(transaction)
-            user.set_portfolio_historical(None)
-            user.save()
             transaction.delete()
         except Exception:
             return False
@@ -91,24 +87,60 @@ class Transaction(Document):
         """
         return Transaction.objects(user=user, sell_date=None)
 
-    def as_dict(self) -> dict:
+    @staticmethod
+    def prefetch_assets(transactions: List['Transaction'], fields: List[str] = None) -> Dict[ObjectId, 'Asset']:
+        """Returns the Assets referenced by the given Transactions, fetched in a single query.
+        
+        Arguments:
+            transactions {List[Transaction]} -- The Transactions to fetch the Assets for.
+            fields {List[str]} -- The only fields of the Assets to load; all if not given. (default: {None})
+        
+        Returns:
+            Dict[ObjectId, Asset] -- The referenced Assets keyed by their unique identifier.
+        """
+        asset_ids = {transaction.get_asset_id() for transaction in transactions}
+        result_set = Asset.objects if fields is None else Asset.objects.only(*fields)
+        return result_set.in_bulk(list(asset_ids))
+
+    def as_dict(self, asset_cache: Dict[ObjectId, 'Asset'] = None) -> dict:
         """Returns the details of the Transaction object as a dictionary.
         
+        Keyword Arguments:
+            asset_cache {Dict[ObjectId, Asset]} -- Prefetched Assets to use instead of dereferencing
+            the Transaction's Asset, as per prefetch_assets(). (default: {None})
+        
         Returns:
             dict -- Details of the Transaction as a dictionary.
         """
+        if asset_cache is None:
+            asset = self.get_asset()
+        else:
+            asset = asset_cache[self.get_asset_id()]
+        # Read the stored values directly rather than through the getters & field descriptors;
+        # this skips MongoEngine's conversion which is safe as nothing is written back
+        data = self._data
+        asset_data = asset._data
+        asset_price = asset_data.get('price')
+        buy_price = data.get('buy_price')
+        sell_price = data.get('sell_price')
+        # As per get_profit_percent()
+        current_price = asset_price if sell_price is None else sell_price
+        if current_price is None:
+            profit_percent = None
+        else:
+            profit_percent = ((current_price-buy_price)/buy_price)*100
         return {
-            "id": self.get_id(),
-            "asset_id": self.get_asset().get_id(),
-            "asset_name": self.get_asset().get_name(),
-            "asset_ticker": self.get_asset().get_ticker(),
-            "asset_price": self.get_asset().get_price(),
-            "quantity": self.get_quantity(),
-            "buy_date": self.get_buy_date(),
-            "buy_price": self.get_buy_price(),
-            "sell_date": self.get_sell_date(),
-            "sell_price": self.get_sell_price(),
-            "profit_percent": self.get_profit_percent()
+            "id": str(data['id']),
+            "asset_id": str(asset_data['id']),
+            "asset_name": asset_data.get('name'),
+            "asset_ticker": asset_data.get('ticker'),
+            "asset_price": asset_price,
+            "quantity": data.get('quantity'),
+            "buy_date": data.get('buy_date'),
+            "buy_price": buy_price,
+            "sell_date": data.get('sell_date'),
+            "sell_price": sell_price,
+            "profit_percent": profit_percent
         }
 
     def get_asset(self) -> 'Asset':
@@ -117,7 +149,20 @@ class Transaction(Document):
         Returns:
             Asset -- The Asset linked to the Transaction.
         """
-        return self.asset
+        # Only fetched the first time; use prefetch_assets() to fetch for many Transactions at once
+        return self.asset.fetch()
+
+    def get_asset_id(self) -> ObjectId:
+        """Returns the unique identifier of the Asset associated with the Transaction without
+        dereferencing it.
+        
+        Returns:
+            ObjectId -- The unique identifier of the linked Asset.
+        """
+        asset = self._data.get('asset')
+        if isinstance(asset, ObjectId):
+            return asset
+        return asset.id
 
     def get_buy_date(self) -> datetime:
         """Returns the datetime the Transaction occurred.
@@ -143,9 +188,12 @@ class Transaction(Document):
         """
         return str(self.pk)
 
-    def get_profit_percent(self) -> float:
+    def get_profit_percent(self, asset: 'Asset' = None) -> float:
         """Returns the profit (as a percent) achieved by the Transaction.
         
+        Keyword Arguments:
+            asset {Asset} -- The already fetched Asset of the Transaction. (default: {None})
+        
         Returns:
             float -- Profit percent of the Transaction - current price is used if the
             Asset has not been sold.
@@ -153,7 +201,9 @@ class Transaction(Document):
         buy_price = self.get_buy_price()
         sell_price = self.get_sell_price()
         if sell_price is None:
-            sell_price = self.get_asset().get_price()
+            if asset is None:
+                asset = self.get_asset()
+            sell_price = asset.get_price()
             if sell_price is None:
                 return None
         return ((sell_price-buy_price)/buy_price)*100
@@ -190,8 +240,32 @@ class Transaction(Document):
         Returns:
             User -- The linked User object.
         """
+        # Only fetched the first time; use get_user_email() when only checking ownership
         return self.user.fetch()
 
+    def get_user_email(self) -> str:
+        """Returns the email address of the User associated with the Transaction, reading only that
+        field rather than the whole User.
+        
+        Returns:
+            str -- The email address of the linked User.
+        """
+        # Imported here as models.user imports this module
+        from models.user import User
+        return User.objects(pk=self.get_user_id()).scalar('email').first()
+
+    def get_user_id(self) -> ObjectId:
+        """Returns the unique identifier of the User associated with the Transaction without
+        dereferencing it.
+        
+        Returns:
+            ObjectId -- The unique identifier of the linked User.
+        """
+        user = self._data.get('user')
+        if isinstance(user, ObjectId):
+            return user
+        return user.id
+
     def set_asset(self, asset: 'Asset') -> None:
         """Sets the Asset of the Transaction.
         
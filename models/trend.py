@@ -1,7 +1,37 @@
 from datetime import datetime
 from typing import Dict
 
-from mongoengine import BooleanField, DateTimeField, Document, IntField, Q, StringField
+from mongoengine import BooleanField, DateTimeField, Document, EmbeddedDocument, IntField, Q, StringField
+
+class TrendSnapshot(EmbeddedDocument):
+
+    timestamp = DateTimeField()
+    is_partial = BooleanField()
+    value = IntField()
+
+    def get_is_partial(self) -> bool:
+        """Returns whether the Trend data is a partial result.
+        
+        Returns:
+            bool -- True if it is a partial result; False otherwise.
+        """
+        return self.is_partial
+
+    def get_timestamp(self) -> datetime:
+        """Returns the datetime of when the search Trend was recorded.
+        
+        Returns:
+            datetime -- The time the search interest was measured by Google.
+        """
+        return self.timestamp
+
+    def get_value(self) -> int:
+        """Returns the relative value of the search interest. (0 to 100)
+        
+        Returns:
+            int -- The relative value (0 to 100) of the Trend snapshot.
+        """
+        return self.value
 
 class Trend(Document):
 
@@ -64,6 +94,14 @@ class Trend(Document):
             "value": self.get_value()
         }
 
+    def as_snapshot(self) -> TrendSnapshot:
+        """Returns a copy of the Trend data which can be embedded in another document.
+        
+        Returns:
+            TrendSnapshot -- The Trend data as an embedded document.
+        """
+        return TrendSnapshot(timestamp=self.get_timestamp(), is_partial=self.get_is_partial(), value=self.get_value())
+
     def get_is_partial(self) -> bool:
         """Returns whether the Trend data is a partial result.
         
@@ -1,9 +1,19 @@
-from datetime import datetime, timedelta
-from typing import List
+from datetime import date, datetime, time, timedelta
+from hashlib import blake2b
+from itertools import accumulate
+from typing import Iterator, List
 import base64
 
-from flask import make_response
-from mongoengine import DateTimeField, DictField, Document, FileField, ListField, ReferenceField, StringField
+from flask import Response
+from mongoengine import DateTimeField, DictField, Document, FileField, ReferenceField, StringField
+
+from models.asset import Asset
+from models.candle import Candle
+from models.constants import INTERVAL_DAY
+from models.transaction import Transaction
+
+# A multiple of 3 so each chunk base64 encodes without padding
+PICTURE_CHUNK_BYTES = 3*64*1024
 
 class User(Document):
     email = StringField(required=True, unique=True)
@@ -12,7 +22,14 @@ class User(Document):
     picture = FileField()
     portfolio_historical = DictField()
     portfolio_historical_lastupdate = DateTimeField()
-    transactions = ListField(ReferenceField('Transaction'))
+    portfolio_historical_key = StringField()
+
+    # The Transactions are looked up by their user rather than listed on the User; the legacy
+    # 'transactions' list is removed by migrate_user_transactions.py, hence the non-strict meta
+    # until it has run
+    meta = {
+        'strict': False
+    }
 
     @staticmethod
     def create(email: str, fullname: str) -> 'User':
@@ -33,24 +50,67 @@ class User(Document):
         return user
 
     @staticmethod
-    def get_by_email(email: str) -> 'User':
+    def get_by_email(email: str, with_picture: bool = False, with_historical: bool = False) -> 'User':
         """Returns the User object associated with the given email.
         
         Arguments:
             email {str} -- The email address to lookup.
+            with_picture {bool} -- Whether to load the profile picture of the User. (default: {False})
+            with_historical {bool} -- Whether to load the historical portfolio of the User. (default: {False})
         
         Returns:
             User -- The User object associated with the email; None if cannot be found.
         """
+        # The historical portfolio holds an entry per day, so it's only loaded when it is read
+        excluded = []
+        if not with_picture:
+            excluded.append('picture')
+        if not with_historical:
+            excluded.append('portfolio_historical')
+        if excluded:
+            return User.objects(email=email).exclude(*excluded).first()
         return User.objects(email=email).first()
 
-    def add_transaction(self, transaction: 'Transaction') -> None:
-        """Adds the given transaction to the User's list of transactions.
+    @staticmethod
+    def get_daily_closes(transactions: List['Transaction']) -> List[dict]:
+        """Returns the daily closing prices of the Assets in the given Transactions over the time they
+        were held, read with a single query rather than one per Transaction.
         
         Arguments:
-            transaction {Transaction} -- The Transaction object to add.
+            transactions {List[Transaction]} -- The Transactions to read the closing prices for.
+        
+        Returns:
+            List[dict] -- The chronological open times and the matching closing prices of the daily
+            Candles, each as a list keyed by the unique identifier of the Asset.
+        """
+        asset_ids = {transaction.get_asset_id() for transaction in transactions}
+        start = min(transaction.get_buy_date() for transaction in transactions)
+        finish = datetime.max
+        if all(transaction.get_sell_date() is not None for transaction in transactions):
+            finish = datetime.combine(max(transaction.get_sell_date() for transaction in transactions).date()+timedelta(days=1), time.min)
+        return Candle.get_asset_closes(asset_ids, INTERVAL_DAY, datetime.combine(start.date(), time.min), finish)
+
+    @staticmethod
+    def get_transactions_key(transactions: List['Transaction']) -> str:
+        """Returns a key which only changes when the given Transactions change in a way which affects
+        the historical portfolio value.
+        
+        Arguments:
+            transactions {List[Transaction]} -- The Transactions the historical portfolio is calculated from.
+        
+        Returns:
+            str -- A hash of the details of the Transactions.
         """
-        self.transactions.append(transaction)
+        details = sorted((
+            transaction.get_id(),
+            str(transaction.get_asset_id()),
+            transaction.get_quantity(),
+            transaction.get_buy_date(),
+            transaction.get_buy_price(),
+            transaction.get_sell_date(),
+            transaction.get_sell_price()
+        ) for transaction in transactions)
+        return blake2b(repr(details).encode('utf8')).hexdigest()
 
     def as_dict(self) -> dict:
         """Returns the details of the User object as a dictionary.
@@ -68,14 +128,6 @@ class User(Document):
             "base_currency": currency_ticker
         }
 
-    def delete_transaction(self, transaction: 'Transaction') -> None:
-        """Deletes the transaction from the list of the User's transactions.
-        
-        Arguments:
-            transaction {Transaction} -- The Transaction to be removed.
-        """
-        self.transactions.remove(transaction)
-
     def get_base_currency(self) -> 'Currency':
         """Returns the base currency of the User.
         
@@ -110,14 +162,36 @@ class User(Document):
             - net_value: The purchase_value combined with the current value of portfolio.
             - value: The value of the portfolio currently.
         """
-        spent_value = 0
-        value = 0
-        for transaction in self.get_transactions():
-            spent_value -= (transaction.get_quantity() * transaction.get_buy_price())
-            if transaction.get_sell_date() is None:
-                value += (transaction.get_quantity() * transaction.get_asset().get_price())
-            else:
-                spent_value += (transaction.get_quantity() * transaction.get_sell_price())
+        # Summed by MongoDB in one round trip, looking up the current price for the open Transactions
+        is_open = {"$eq": [{"$ifNull": ["$sell_date", None]}, None]}
+        pipeline = [
+            {"$match": {"user": self.pk}},
+            {"$lookup": {
+                "from": Asset._get_collection_name(),
+                "let": {"asset": "$asset"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$asset"]}}},
+                    {"$project": {"_id": 0, "price": 1}}
+                ],
+                "as": "asset"
+            }},
+            {"$group": {
+                "_id": None,
+                "spent_value": {"$sum": {"$cond": [
+                    is_open,
+                    {"$multiply": [-1, "$quantity", "$buy_price"]},
+                    {"$multiply": ["$quantity", {"$subtract": ["$sell_price", "$buy_price"]}]}
+                ]}},
+                "value": {"$sum": {"$cond": [
+                    is_open,
+                    {"$multiply": ["$quantity", {"$arrayElemAt": ["$asset.price", 0]}]},
+                    0
+                ]}}
+            }}
+        ]
+        totals = next(Transaction._get_collection().aggregate(pipeline), {})
+        spent_value = totals.get('spent_value', 0)
+        value = totals.get('value', 0)
         result = {
             "purchase_value": spent_value,
             "net_value": spent_value + value,
@@ -131,12 +205,15 @@ class User(Document):
         Returns:
             DictField -- Returns a dictionary containing all the dates in the history of a User's
             portfolio with a underlying dictionary as per get_portfolio_current(). If the historical
-            portfolio is not up-to-date it will return {'empty': True}
+            portfolio is not up-to-date it will return None.
         """
         if self.portfolio_historical_lastupdate is None:
             return None
         if self.portfolio_historical_lastupdate.date() != datetime.utcnow().date():
             return None
+        # Only recalculated when the Transactions have changed since it was last calculated
+        if self.portfolio_historical_key != User.get_transactions_key(self.get_transactions()):
+            return None
         return self.portfolio_historical
 
     def get_picture(self) -> 'Response':
@@ -147,10 +224,17 @@ class User(Document):
         """
         if self.picture is None:
             return None
-        content = self.picture.read()
-        if content is None:
+        picture = self.picture.get()
+        if picture is None:
             return None
-        response = make_response(base64.b64encode(content))
+        # Encode the file as it's streamed from GridFS rather than reading it into memory first
+        def generate_encoded() -> Iterator[bytes]:
+            chunk = picture.read(PICTURE_CHUNK_BYTES)
+            while chunk:
+                yield base64.b64encode(chunk)
+                chunk = picture.read(PICTURE_CHUNK_BYTES)
+        response = Response(generate_encoded())
+        response.headers.set("Content-Length", 4*((picture.length+2)//3))
         response.headers.set("Content-Type", self.picture.content_type)
         response.headers.set("Content-Disposition", "attachment", filename=self.picture.filename)
         return response
@@ -161,7 +245,7 @@ class User(Document):
         Returns:
             List(Transaction) -- List of the Transactions the User was involved in.
         """
-        return self.transactions
+        return list(Transaction.objects(user=self))
 
     def set_base_currency(self, base_currency: 'Currency') -> None:
         """Set the base currency for a User.
@@ -198,52 +282,74 @@ class User(Document):
     def update_portfolio_historical(self) -> None:
         """Update the User's historical portfolio value from their transactions.
         """
-        spent_value = {"default": 0}
-        value = {"default": 0}
-        earliest_date = None
         latest_date = datetime.utcnow().date()
-        for transaction in self.get_transactions():
-            buy_date = transaction.get_buy_date().date() if (transaction.get_buy_date() is not None) else None
-            if earliest_date is None or buy_date < earliest_date:
-                earliest_date = buy_date
-            sell_date = (transaction.get_sell_date().date()+timedelta(days=1)) if (transaction.get_sell_date() is not None) else None
-            candles = transaction.get_asset().get_candles_within(start=buy_date, finish=sell_date)
-            for candle in candles:
-                tag = str(candle.get_open_time().date())
-                if tag in value:
-                    value[tag] = value[tag] + (transaction.get_quantity() * candle.get_close())
-                else:
-                    value[tag] = (candle.get_close() * transaction.get_quantity())
-                if tag in spent_value:
-                    spent_value[tag] = spent_value[tag] - (transaction.get_quantity() * transaction.get_buy_price())
-                else:
-                    spent_value[tag] = - (transaction.get_quantity() * transaction.get_buy_price())
-            if sell_date is not None:
-                curr_date = sell_date
-                while curr_date < latest_date:
-                    tag = str(curr_date)
-                    if tag in spent_value:
-                        spent_value[tag] = spent_value[tag] + (transaction.get_quantity() * (transaction.get_sell_price() - transaction.get_buy_price()))
-                    else:
-                        spent_value[tag] = (transaction.get_quantity() * (transaction.get_sell_price() - transaction.get_buy_price()))
-                    curr_date = curr_date + timedelta(days=1)
-        if len(value) == 1 or len(spent_value) == 1:
+        transactions = self.get_transactions()
+        if not transactions:
+            self.portfolio_historical = {}
+            self.portfolio_historical_lastupdate = datetime.utcnow()
+            self.portfolio_historical_key = User.get_transactions_key(transactions)
+            return
+        open_times, closes = User.get_daily_closes(transactions)
+        earliest_date = min(transaction.get_buy_date() for transaction in transactions).date()
+        # The values are accumulated in a list per day (from the earliest purchase up to today)
+        # rather than in dictionaries keyed by the date; each day is its integer offset from the
+        # ordinal of the earliest purchase date, so no date objects are built per candle
+        earliest_day = earliest_date.toordinal()
+        days = latest_date.toordinal()-earliest_day
+        # Each Transaction is recorded as changes on the day it's bought & the day after it's sold;
+        # the running totals of these give what was held on each day without visiting every day
+        # of every Transaction
+        holdings_changes = {asset_id: [0] * (days+1) for asset_id in open_times}
+        quantity_changes = {asset_id: [0] * (days+1) for asset_id in open_times}
+        cost_changes = {asset_id: [0] * (days+1) for asset_id in open_times}
+        profit_changes = [0] * (days+1)
+        for transaction in transactions:
+            quantity = transaction.get_quantity()
+            buy_price = transaction.get_buy_price()
+            buy_day = min(transaction.get_buy_date().toordinal()-earliest_day, days)
+            if transaction.get_sell_date() is None:
+                sell_day = days
+            else:
+                sell_day = min(transaction.get_sell_date().toordinal()+1-earliest_day, days)
+                profit_changes[sell_day] += quantity * (transaction.get_sell_price() - buy_price)
+            if buy_day < sell_day:
+                asset_id = transaction.get_asset_id()
+                holdings_changes[asset_id][buy_day] += 1
+                holdings_changes[asset_id][sell_day] -= 1
+                quantity_changes[asset_id][buy_day] += quantity
+                quantity_changes[asset_id][sell_day] -= quantity
+                cost_changes[asset_id][buy_day] += quantity * buy_price
+                cost_changes[asset_id][sell_day] -= quantity * buy_price
+        spent_value = list(accumulate(profit_changes[:days]))
+        value = [0] * days
+        has_candles = False
+        for asset_id, asset_open_times in open_times.items():
+            holdings = list(accumulate(holdings_changes[asset_id]))
+            quantities = list(accumulate(quantity_changes[asset_id]))
+            costs = list(accumulate(cost_changes[asset_id]))
+            for open_time, close in zip(asset_open_times, closes[asset_id]):
+                day = open_time.toordinal()-earliest_day
+                if day >= days:
+                    break
+                # Skip the days on which nothing is held rather than relying on the running
+                # quantity returning to exactly zero
+                if holdings[day]:
+                    has_candles = True
+                    value[day] += quantities[day] * close
+                    spent_value[day] -= costs[day]
+        if not has_candles:
             self.portfolio_historical = {}
             self.portfolio_historical_lastupdate = datetime.utcnow()
+            self.portfolio_historical_key = User.get_transactions_key(transactions)
             return
-        curr_date = earliest_date
+        # The days are only formatted as ISO dates (as per str(date)) when building the result
         result = {}
-        while curr_date < latest_date:
-            tag = str(curr_date)
-            if tag not in spent_value:
-                spent_value[tag] = 0
-            if tag not in value:
-                value[tag] = 0
-            result[tag] = {
-                "purchase_value": spent_value[tag],
-                "net_value": spent_value[tag] + value[tag],
-                "value": value[tag]
+        for day in range(days):
+            result[date.fromordinal(earliest_day+day).isoformat()] = {
+                "purchase_value": spent_value[day],
+                "net_value": spent_value[day] + value[day],
+                "value": value[day]
             }
-            curr_date = curr_date + timedelta(days=1)
         self.portfolio_historical = result
         self.portfolio_historical_lastupdate = datetime.utcnow()
+        self.portfolio_historical_key = User.get_transactions_key(transactions)
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from models.asset import Asset, Stock
+
+def test_load_legacy_latest_trend_reference():
+    # Assets synced before the latest trend was embedded store a reference under 'latest_trend'
+    son = {
+        "_id": ObjectId(),
+        "_cls": "Asset.Stock",
+        "ticker": "AAPL",
+        "name": "Apple Inc.",
+        "latest_trend": ObjectId(),
+        "latest_trend_timestamp": datetime(2019, 10, 1)
+    }
+    asset = Asset._from_son(son)
+    assert isinstance(asset, Stock)
+    assert asset.get_latest_trend() is None
+    assert asset.get_latest_trend_timestamp() == datetime(2019, 10, 1)
+
+def test_load_latest_trend_snapshot():
+    son = {
+        "_id": ObjectId(),
+        "_cls": "Asset.Stock",
+        "ticker": "AAPL",
+        "name": "Apple Inc.",
+        "latest_trend_snapshot": {"timestamp": datetime(2019, 10, 1), "is_partial": False, "value": 42}
+    }
+    asset = Asset._from_son(son)
+    assert asset.get_latest_trend().get_value() == 42
+    assert asset.get_latest_trend().get_timestamp() == datetime(2019, 10, 1)
@@ -0,0 +1,55 @@
+from hashlib import sha256
+from unittest.mock import patch
+
+from bson import ObjectId
+
+from local_config import PASSWORD_HASH_ITERATIONS
+from models.auth import Auth
+
+EMAIL = "user@example.com"
+PASSWORD = "correct horse battery staple"
+LEGACY_SALT = "0123456789abcdef"
+
+def legacy_hash(password: str, salt: str) -> str:
+    # As hashed before PBKDF2 was introduced
+    return sha256(str(password + salt).encode('utf8')).hexdigest()
+
+def authenticate(doc: dict, password: str) -> list:
+    with patch.object(Auth, '_get_collection') as get_collection, patch.object(Auth, 'save') as save:
+        get_collection.return_value.find_one.return_value = dict(doc)
+        user = Auth.authenticate(EMAIL, password)
+    return [user, save]
+
+def test_hash_password_legacy():
+    assert Auth.hash_password(PASSWORD, LEGACY_SALT) == legacy_hash(PASSWORD, LEGACY_SALT)
+
+def test_authenticate_legacy_rehashes():
+    doc = {"_id": ObjectId(), "password": legacy_hash(PASSWORD, LEGACY_SALT), "salt": LEGACY_SALT}
+    user, save = authenticate(doc, PASSWORD)
+    assert user is not None
+    assert user.get_email() == EMAIL
+    assert user.get_iterations() == PASSWORD_HASH_ITERATIONS
+    assert user.get_salt() != LEGACY_SALT
+    assert user.get_password() == Auth.hash_password(PASSWORD, user.get_salt(), PASSWORD_HASH_ITERATIONS)
+    save.assert_called_once()
+
+def test_authenticate_pbkdf2():
+    salt = "fedcba9876543210fedcba9876543210"
+    doc = {"_id": ObjectId(), "password": Auth.hash_password(PASSWORD, salt, PASSWORD_HASH_ITERATIONS), "salt": salt, "iterations": PASSWORD_HASH_ITERATIONS}
+    user, save = authenticate(doc, PASSWORD)
+    assert user is not None
+    assert user.get_salt() == salt
+    save.assert_not_called()
+
+def test_authenticate_wrong_password_legacy():
+    doc = {"_id": ObjectId(), "password": legacy_hash(PASSWORD, LEGACY_SALT), "salt": LEGACY_SALT}
+    user, save = authenticate(doc, "wrong password")
+    assert user is None
+    save.assert_not_called()
+
+def test_authenticate_wrong_password_pbkdf2():
+    salt = "fedcba9876543210fedcba9876543210"
+    doc = {"_id": ObjectId(), "password": Auth.hash_password(PASSWORD, salt, PASSWORD_HASH_ITERATIONS), "salt": salt, "iterations": PASSWORD_HASH_ITERATIONS}
+    user, save = authenticate(doc, "wrong password")
+    assert user is None
+    save.assert_not_called()
@@ -0,0 +1,26 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from bson import ObjectId
+
+from models.asset import Stock
+from models.candle import Candle
+from models.constants import INTERVAL_WEEK
+
+def test_bulk_upsert_skips_empty_period():
+    asset = Stock(id=ObjectId(), ticker="AAPL", name="Apple Inc.")
+    # As per AssetUpdaterAggregation.aggregate_candles() for a week without market open candles
+    empty_week = Candle(asset=asset, open=0, close=0, interval=INTERVAL_WEEK)
+    week = Candle(asset=asset, open=1.0, close=2.0, high=2.0, low=1.0, open_time=datetime(2019, 10, 7), interval=INTERVAL_WEEK)
+    with patch.object(Candle, '_get_collection') as get_collection:
+        get_collection.return_value.bulk_write.return_value.upserted_count = 1
+        assert Candle.bulk_upsert([empty_week, week]) == 1
+    operations = get_collection.return_value.bulk_write.call_args[0][0]
+    assert len(operations) == 1
+
+def test_bulk_upsert_only_empty_periods():
+    asset = Stock(id=ObjectId(), ticker="AAPL", name="Apple Inc.")
+    empty_week = Candle(asset=asset, open=0, close=0, interval=INTERVAL_WEEK)
+    with patch.object(Candle, '_get_collection') as get_collection:
+        assert Candle.bulk_upsert([empty_week]) == 0
+    get_collection.return_value.bulk_write.assert_not_called()
@@ -0,0 +1,50 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from bson import ObjectId
+
+from models.transaction import Transaction
+from models.user import User
+
+class FixedDatetime(datetime):
+
+    @classmethod
+    def utcnow(cls) -> datetime:
+        return datetime(2019, 10, 6, 12)
+
+def test_update_portfolio_historical():
+    asset_a = ObjectId()
+    asset_b = ObjectId()
+    user = User(email="user@example.com")
+    transactions = [
+        # Sold in full, so nothing of the Asset is held from the day after the sale
+        Transaction(id=ObjectId(), user=ObjectId(), asset=asset_a, quantity=2.0, buy_date=datetime(2019, 10, 1), buy_price=10.0, sell_date=datetime(2019, 10, 3), sell_price=13.0),
+        Transaction(id=ObjectId(), user=ObjectId(), asset=asset_b, quantity=1.0, buy_date=datetime(2019, 10, 2), buy_price=100.0)
+    ]
+    open_times = {
+        asset_a: [datetime(2019, 10, 1), datetime(2019, 10, 2), datetime(2019, 10, 3), datetime(2019, 10, 4)],
+        # No candles on the 3rd or 5th
+        asset_b: [datetime(2019, 10, 2), datetime(2019, 10, 4)]
+    }
+    closes = {
+        asset_a: [11.0, 12.0, 13.0, 14.0],
+        asset_b: [101.0, 104.0]
+    }
+    with patch('models.user.datetime', FixedDatetime), \
+            patch.object(User, 'get_transactions', return_value=transactions), \
+            patch.object(User, 'get_daily_closes', return_value=[open_times, closes]):
+        user.update_portfolio_historical()
+    assert user.portfolio_historical == {
+        "2019-10-01": {"purchase_value": -20.0, "net_value": 2.0, "value": 22.0},
+        "2019-10-02": {"purchase_value": -120.0, "net_value": 5.0, "value": 125.0},
+        "2019-10-03": {"purchase_value": -20.0, "net_value": 6.0, "value": 26.0},
+        "2019-10-04": {"purchase_value": -94.0, "net_value": 10.0, "value": 104.0},
+        "2019-10-05": {"purchase_value": 6.0, "net_value": 6.0, "value": 0}
+    }
+    assert user.portfolio_historical_key == User.get_transactions_key(transactions)
+
+def test_update_portfolio_historical_without_transactions():
+    user = User(email="user@example.com")
+    with patch.object(User, 'get_transactions', return_value=[]):
+        user.update_portfolio_historical()
+    assert user.portfolio_historical == {}